@@ -0,0 +1,161 @@
+"""
+"""
+import math
+import numpy as np
+
+class AltitudeRaster:
+    """
+    Regular grid over the bounding box of a track holding the altitude and
+    its gradient at every grid point, for vectorized bilinear lookups in
+    place of KDTree queries.
+
+    The altitude at a grid point is the average z of its k nearest track
+    points, the same value getAltitude computes, and the gradient is the
+    central difference of the altitude grid, i.e. the local slope.
+    """
+    # resolution = spacing of the grid points
+    # xMin, yMin = position of the grid point [0, 0]
+    # altitude = (ny, nx) altitude at each grid point
+    # gradientX, gradientY = (ny, nx) dz/dx and dz/dy at each grid point
+
+    def __init__(self, kdTree, points, resolution = 0.1, maxBytes = 64*2**20, k = 4):
+        """
+        Creates the raster of the track whose points are indexed by kdTree.
+
+        If the grid at the given resolution would take more than maxBytes, the
+        resolution is coarsened until it fits.
+
+        Parameter kdTree: the KDTree of the 2D projection of points
+        Precondition: kdTree is a sklearn KDTree
+
+        Parameter points: the 3D points of the track
+        Precondition: points is an array-like of shape (n, 3), in the order
+        of the points of kdTree
+
+        Optional Parameter resolution: the spacing of the grid points
+        Precondition: resolution is a number > 0
+
+        Optional Parameter maxBytes: the memory budget of the three grids
+        Precondition: maxBytes is an int > 0
+
+        Optional Parameter k: the number of nearest points averaged
+        Precondition: k is an int > 0
+        """
+        assert resolution > 0 and maxBytes > 0 and k > 0
+        points = np.asarray(points, dtype=float)
+        self.xMin, self.yMin = points[:, 0].min(), points[:, 1].min()
+        width = points[:, 0].max() - self.xMin
+        height = points[:, 1].max() - self.yMin
+        bytesPerPoint = 3*np.dtype(float).itemsize
+        while (math.ceil(width/resolution) + 1)*(math.ceil(height/resolution) + 1)*bytesPerPoint > maxBytes:
+            resolution *= 1.25
+        self.resolution = resolution
+        nx = math.ceil(width/resolution) + 1
+        ny = math.ceil(height/resolution) + 1
+
+        X, Y = np.meshgrid(self.xMin + resolution*np.arange(nx),
+                           self.yMin + resolution*np.arange(ny))
+        gridPoints = np.column_stack((X.reshape(-1), Y.reshape(-1)))
+        altitude = np.empty(len(gridPoints))
+        chunkSize = 65536
+        for lo in range(0, len(gridPoints), chunkSize):
+            indices = kdTree.query(gridPoints[lo:lo+chunkSize], k=k, return_distance = False)
+            altitude[lo:lo+chunkSize] = points[indices, 2].mean(axis=1)
+        self.altitude = altitude.reshape(ny, nx)
+        if ny > 1 and nx > 1:
+            self.gradientY, self.gradientX = np.gradient(self.altitude, resolution)
+        else:
+            self.gradientY = np.zeros_like(self.altitude)
+            self.gradientX = np.zeros_like(self.altitude)
+
+    @property
+    def nbytes(self):
+        """
+        The memory used by the grids.
+        """
+        return self.altitude.nbytes + self.gradientX.nbytes + self.gradientY.nbytes
+
+    def _bilinear(self, grid, x, y):
+        """
+        Helper function interpolating grid bilinearly at points (x, y), which
+        are clamped to the bounding box
+        """
+        ny, nx = grid.shape
+        u = np.clip((np.asarray(x, dtype=float) - self.xMin)/self.resolution, 0, nx - 1)
+        v = np.clip((np.asarray(y, dtype=float) - self.yMin)/self.resolution, 0, ny - 1)
+        i = np.minimum(np.floor(u).astype(np.int64), max(nx - 2, 0))
+        j = np.minimum(np.floor(v).astype(np.int64), max(ny - 2, 0))
+        i1 = np.minimum(i + 1, nx - 1); j1 = np.minimum(j + 1, ny - 1)
+        fu = u - i; fv = v - j
+        return ((grid[j, i]*(1 - fu) + grid[j, i1]*fu)*(1 - fv) +
+                (grid[j1, i]*(1 - fu) + grid[j1, i1]*fu)*fv)
+
+    def altitudeAt(self, x, y):
+        """
+        Returns the altitude at the points (x, y).
+
+        Parameter x, y: the coordinates of the points
+        Precondition: x and y are numbers or broadcastable arrays
+        """
+        return self._bilinear(self.altitude, x, y)
+
+    def gradientAt(self, x, y):
+        """
+        Returns (dz/dx, dz/dy) at the points (x, y).
+
+        Parameter x, y: the coordinates of the points
+        Precondition: x and y are numbers or broadcastable arrays
+        """
+        return self._bilinear(self.gradientX, x, y), self._bilinear(self.gradientY, x, y)
+
+    def verticalAngleAt(self, x, y, heading):
+        """
+        Returns the local vertical angle in radians at the points (x, y) of
+        the slope along heading: positive uphill, negative downhill.
+
+        Parameter x, y: the coordinates of the points
+        Precondition: x and y are numbers or broadcastable arrays
+
+        Parameter heading: the direction of travel, atan2(dy, dx)
+        Precondition: heading is a number or array broadcastable with x
+        """
+        if heading is None:
+            raise ValueError("the vertical angle on an altitude raster needs a heading")
+        gx, gy = self.gradientAt(x, y)
+        return np.arctan(gx*np.cos(heading) + gy*np.sin(heading))
+
+    def accuracy(self, kdTree, points, x, y, k = 4):
+        """
+        Returns a dictionary with the maximum, mean and root mean square error
+        of altitudeAt against the average z of the k nearest track points at
+        the sample points (x, y).
+
+        Parameter kdTree, points: the KDTree and points the raster was built from
+
+        Parameter x, y: the coordinates of the sample points
+        Precondition: x and y are 1-D arrays of the same length
+        """
+        points = np.asarray(points, dtype=float)
+        samples = np.column_stack((np.asarray(x, dtype=float), np.asarray(y, dtype=float)))
+        indices = kdTree.query(samples, k=k, return_distance = False)
+        error = np.abs(self.altitudeAt(samples[:, 0], samples[:, 1]) - points[indices, 2].mean(axis=1))
+        return {"resolution": self.resolution, "nbytes": self.nbytes,
+                "maxError": float(error.max()), "meanError": float(error.mean()),
+                "rmsError": float(np.sqrt(np.mean(error**2)))}
+
+
+def verticalAngleSanityTest():
+    """
+    Checks verticalAngleAt on a plane rising along x: positive going up,
+    negative going down and smaller across the slope.
+    """
+    from sklearn.neighbors import KDTree
+    X, Y = np.meshgrid(np.linspace(0, 10, 41), np.linspace(0, 4, 17))
+    points = np.column_stack((X.reshape(-1), Y.reshape(-1), 0.1*X.reshape(-1)))
+    raster = AltitudeRaster(KDTree(points[:, :2]), points, 0.25)
+    up = float(raster.verticalAngleAt(5, 2, 0))
+    down = float(raster.verticalAngleAt(5, 2, math.pi))
+    across = float(raster.verticalAngleAt(5, 2, math.pi/2))
+    assert up > 0 and abs(up - math.atan(0.1)) < 0.05, "Expected: about "+str(math.atan(0.1))+" but was "+str(up)
+    assert down < 0 and abs(down + up) < 1e-12, "Expected: "+str(-up)+" but was "+str(down)
+    assert abs(across) < abs(up), "Expected: about 0 but was "+str(across)
@@ -0,0 +1,100 @@
+"""
+"""
+import numpy as np
+
+class ArcLengthIndex:
+    """
+    Arc length parameterization of a polyline: the cumulative distance along
+    it is computed once, and the position, heading and grade at any distance
+    are found by binary search and linear interpolation, vectorized over
+    arrays of distances.
+    """
+    # points = (n, 3) array of the points of the polyline
+    # distance = (n,) cumulative 3D distance of each point from the first one
+    # _heading = (n-1,) heading of each segment in radians, atan2(dy, dx)
+    # _grade = (n-1,) grade of each segment, rise over horizontal run
+
+    def __init__(self, points):
+        """
+        Creates the index of a polyline.
+
+        Parameter points: the points of the polyline, in order
+        Precondition: points is an array-like of shape (n, 3) with n >= 2
+        """
+        points = np.asarray(points, dtype=float)
+        assert points.ndim == 2 and points.shape[1] >= 3 and len(points) >= 2
+        self.points = points[:, :3]
+        delta = np.diff(self.points, axis=0)
+        horizontal = np.hypot(delta[:, 0], delta[:, 1])
+        self._segmentLength = np.sqrt(horizontal**2 + delta[:, 2]**2)
+        self.distance = np.concatenate([[0.0], np.cumsum(self._segmentLength)])
+        self._heading = np.arctan2(delta[:, 1], delta[:, 0])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._grade = np.where(horizontal > 0, delta[:, 2]/horizontal, 0.0)
+
+    @property
+    def length(self):
+        """
+        The total length of the polyline.
+        """
+        return float(self.distance[-1])
+
+    def _locate(self, distance):
+        """
+        Helper function returning the segment of each distance, clipped to
+        [0, length], and the fraction of the segment covered
+        """
+        distance = np.clip(np.asarray(distance, dtype=float), 0, self.length)
+        segment = np.searchsorted(self.distance, distance, side='right') - 1
+        segment = np.clip(segment, 0, len(self._segmentLength) - 1)
+        length = self._segmentLength[segment]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(length > 0, (distance - self.distance[segment])/length, 0.0)
+        return segment, fraction
+
+    def position(self, distance):
+        """
+        Returns the (..., 3) array of the points at the given distances along
+        the polyline. Distances outside [0, length] are clipped.
+        Time: O(log n) per distance.
+
+        Parameter distance: the distances along the polyline
+        Precondition: distance is a number or an array of numbers
+        """
+        segment, fraction = self._locate(distance)
+        start = self.points[segment]
+        return start + (self.points[segment + 1] - start)*fraction[..., None]
+
+    def heading(self, distance):
+        """
+        Returns the heading in radians (atan2(dy, dx)) of the segment at the
+        given distances along the polyline.
+
+        Parameter distance: the distances along the polyline
+        Precondition: distance is a number or an array of numbers
+        """
+        return self._heading[self._locate(distance)[0]]
+
+    def grade(self, distance):
+        """
+        Returns the grade (rise over horizontal run) of the segment at the
+        given distances along the polyline.
+
+        Parameter distance: the distances along the polyline
+        Precondition: distance is a number or an array of numbers
+        """
+        return self._grade[self._locate(distance)[0]]
+
+    def at(self, distance):
+        """
+        Returns (x, y, z, heading, grade) at the given distances along the
+        polyline, each with the shape of distance.
+
+        Parameter distance: the distances along the polyline
+        Precondition: distance is a number or an array of numbers
+        """
+        segment, fraction = self._locate(distance)
+        start = self.points[segment]
+        point = start + (self.points[segment + 1] - start)*fraction[..., None]
+        return (point[..., 0], point[..., 1], point[..., 2],
+                self._heading[segment], self._grade[segment])
@@ -0,0 +1,185 @@
+"""
+"""
+import math
+import numpy as np
+from VectorizedDP import candidateStates
+from DPStateStore import DPStateStore
+from Optimizer import steeringAngles
+
+inf = float("inf")
+
+class BeamStateStore(DPStateStore):
+    """
+    DPStateStore of the beam-pruned dynamic program, where every speed has
+    beamWidth states per time instead of one: column s*beamWidth + k holds
+    the k-th cheapest state at speed index s, and backPointer the column of
+    the previous state, so backtrace follows the beam unchanged.
+
+    candidates, merged and pruned count, per time step, the finite cost
+    candidate states, those dropped as duplicates of a cheaper state in the
+    same grid cell and those dropped for not being in the top beamWidth.
+    """
+    # beamWidth = the number of states per time and speed
+    # candidates, merged, pruned = (T,) int arrays of the counts of each step
+
+    def __init__(self, maxTime, speedList, beamWidth):
+        """
+        Initializes a store of maxTime x len(speedList) x beamWidth
+        unreachable states.
+
+        Parameter beamWidth: the number of states kept per time and speed
+        Precondition: beamWidth is an int > 0
+
+        See DPStateStore for the other parameters.
+        """
+        assert beamWidth > 0
+        super().__init__(maxTime, [speed for speed in speedList for k in range(beamWidth)])
+        self.beamWidth = beamWidth
+        self.candidates = np.zeros(maxTime, dtype=np.int64)
+        self.merged = np.zeros(maxTime, dtype=np.int64)
+        self.pruned = np.zeros(maxTime, dtype=np.int64)
+
+    def bestCost(self):
+        """
+        Returns the minimum cost at the last time, inf if no state is reachable.
+        """
+        return float(self.cost[-1].min())
+
+    def report(self):
+        """
+        Returns a dictionary of the pruning counts summed over all time steps
+        and the minimum final cost.
+        """
+        return {"beamWidth": self.beamWidth,
+                "candidates": int(self.candidates.sum()),
+                "merged": int(self.merged.sum()),
+                "pruned": int(self.pruned.sum()),
+                "kept": int(np.isfinite(self.cost[1:]).sum()),
+                "cost": self.bestCost()}
+
+
+def beamStep(interpolatedTrackData, previousCost, previousX, previousY,
+             previousHeading, previousDistance, previousSpeeds, currentSpeeds,
+             steeringAngles, averageDistance, maxDistance, beamWidth,
+             positionResolution = None, headingResolution = None):
+    """
+    Returns (cost, x, y, heading, distance, backPointer, counts) of the
+    beamWidth best states at each of currentSpeeds, given the previous states.
+
+    The candidates are those of VectorizedDP.candidateStates, plus a finished
+    car stopping where it is. If positionResolution is given, candidates of
+    a current speed falling in the same (x, y, heading) grid cell are merged
+    into the cheapest one; then the beamWidth cheapest are kept, ties broken
+    by the first previous state and then the first steering angle. With
+    beamWidth 1 and no grid this is exactly dpStep.
+
+    The returned arrays are (C, beamWidth), sorted by cost, with cost inf
+    and backPointer -1 where there are fewer states; backPointer indexes the
+    previous states. counts is (candidates, merged, pruned).
+
+    Parameter previousCost, previousX, previousY, previousHeading,
+    previousDistance, previousSpeeds: the previous states and their speeds
+    Precondition: these are (P,) float arrays, cost inf if unreachable
+
+    Parameter currentSpeeds: the speeds to compute the states of
+    Precondition: currentSpeeds is a (C,) float array
+
+    Parameter steeringAngles: the possible steering angles
+    Precondition: steeringAngles is a (A,) float array
+
+    Parameter beamWidth: the number of states kept per current speed
+    Precondition: beamWidth is an int > 0
+
+    Optional Parameter positionResolution, headingResolution: the size of
+    the grid cells in distance and in radians, by default no merging;
+    headingResolution defaults to 2*pi (any heading) when only
+    positionResolution is given
+    Precondition: these are None or numbers > 0
+    """
+    c, p, candidateCost, candidateX, candidateY, candidateHeading, currentDistance, finished = \
+        candidateStates(interpolatedTrackData, previousCost, previousX, previousY,
+                        previousHeading, previousDistance, previousSpeeds, currentSpeeds,
+                        steeringAngles, averageDistance, maxDistance)
+    # the finite candidates, then a finished car stopping where it is in the
+    # first steering angle slot, in (current speed, previous state, angle) order
+    l, a = np.nonzero(candidateCost < inf)
+    stopC, stopP = np.nonzero(finished & np.isfinite(previousCost)[None, :] &
+                              (currentSpeeds[:, None] == 0))
+    stop = np.zeros(len(stopC), dtype=a.dtype)
+    order = np.lexsort((np.concatenate([a, stop]), np.concatenate([p[l], stopP]),
+                        np.concatenate([c[l], stopC])))
+    c = np.concatenate([c[l], stopC])[order]
+    p = np.concatenate([p[l], stopP])[order]
+    cost = np.concatenate([candidateCost[l, a], previousCost[stopP]])[order]
+    x = np.concatenate([candidateX[l, a], previousX[stopP]])[order]
+    y = np.concatenate([candidateY[l, a], previousY[stopP]])[order]
+    heading = np.concatenate([candidateHeading[l, a], stop])[order]
+    numCandidates = len(c)
+    if positionResolution is not None and numCandidates:
+        if headingResolution is None:
+            headingResolution = 2*math.pi
+        cellX = np.floor(x/positionResolution)
+        cellY = np.floor(y/positionResolution)
+        cellHeading = np.floor(np.mod(heading, 2*math.pi)/headingResolution)
+        order = np.lexsort((np.arange(numCandidates), cost, cellHeading, cellY, cellX, c))
+        keys = np.column_stack((c, cellX, cellY, cellHeading))[order]
+        first = np.ones(numCandidates, dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+        keep = np.sort(order[first])
+        c, p, cost, x, y, heading = c[keep], p[keep], cost[keep], x[keep], y[keep], heading[keep]
+    numMerged = numCandidates - len(c)
+
+    # the beamWidth cheapest of each current speed
+    order = np.lexsort((np.arange(len(c)), cost, c))
+    groupStart = np.searchsorted(c[order], c[order], side='left')
+    rank = np.arange(len(c)) - groupStart
+    keep = order[rank < beamWidth]
+    rank = rank[rank < beamWidth]
+    numPruned = len(c) - len(keep)
+
+    shape = (len(currentSpeeds), beamWidth)
+    result = [np.full(shape, inf) for i in range(5)]
+    backPointer = np.full(shape, -1, dtype=np.int32)
+    for array, values in zip(result, (cost, x, y, heading, currentDistance[c, p])):
+        array[c[keep], rank] = values[keep]
+    backPointer[c[keep], rank] = p[keep]
+    return tuple(result) + (backPointer, (numCandidates, numMerged, numPruned))
+
+
+def optimizeBeam(interpolatedTrackData, maxTime = 30, speedList = list(range(16)),
+                 steeringAngleList = None, beamWidth = 4, positionResolution = None,
+                 headingResolution = None, verbose = False):
+    """
+    Returns the BeamStateStore of the beam-pruned dynamic program over time,
+    speed, position and heading for the given track.
+
+    Optimizer.optimize keeps the single cheapest (x, y, heading) per time and
+    speed; this keeps the beamWidth cheapest, optionally merging states on a
+    (positionResolution, headingResolution) grid, so that a state that is
+    more expensive now but better placed for later survives. beamWidth 1
+    without a grid gives the same result as Optimizer.optimize.
+
+    See beamStep for the parameters.
+    """
+    if steeringAngleList is None:
+        steeringAngleList = steeringAngles()
+    angles = np.array(steeringAngleList)
+    maxDistance = interpolatedTrackData.distanceToCover
+    averageDistance = maxDistance/maxTime
+    store = BeamStateStore(maxTime, speedList, beamWidth)
+    store.cost[0, 0] = 0.0
+    store.x[0, 0] = float(interpolatedTrackData.startingPoint[0])
+    store.y[0, 0] = float(interpolatedTrackData.startingPoint[1])
+    store.distance[0, 0] = 0.0
+    store.heading[0, 0] = 0.0
+    currentSpeeds = store.speeds[::beamWidth]
+    for t in range(1, maxTime):
+        *column, counts = beamStep(interpolatedTrackData, store.cost[t-1],
+            store.x[t-1], store.y[t-1], store.heading[t-1], store.distance[t-1],
+            store.speeds, currentSpeeds, angles, averageDistance, maxDistance,
+            beamWidth, positionResolution, headingResolution)
+        store.setColumn(t, *[array.reshape(-1) for array in column])
+        store.candidates[t], store.merged[t], store.pruned[t] = counts
+        if verbose:
+            print(t)
+    return store
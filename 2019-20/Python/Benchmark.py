@@ -0,0 +1,82 @@
+"""
+"""
+import os
+import time
+from Optimizer import *
+from ParallelDP import optimizeParallel
+from BeamDP import optimizeBeam
+
+def benchmarkTimeStep(maxTime = 10):
+    """
+    Prints the seconds per time step of Optimizer.optimize on the trial track
+    with the loops and with the vectorized dpStep, and checks that both give
+    the same speed profile and path.
+    """
+    interpolatedTrackData = trialTrack()
+    results = []
+    for vectorized in (False, True):
+        start = time.perf_counter()
+        costArray = optimize(interpolatedTrackData, maxTime, vectorized = vectorized)
+        results.append(((time.perf_counter() - start)/(maxTime - 1), backtrace(costArray)))
+    (loops, loopsResult), (vectorized, vectorizedResult) = results
+    print("2019-20 DP, %d speeds x %d steering angles:" % (16, len(steeringAngles())))
+    print("  loops      %.4f s per time step" % loops)
+    print("  vectorized %.4f s per time step (%.0fx)" % (vectorized, loops/vectorized))
+    print("  same speed profile and path:", loopsResult == vectorizedResult)
+
+
+def benchmarkScaling(maxWorkers = None, maxTime = 10, numSpeeds = 64, numAngles = 72):
+    """
+    Prints the seconds per time step of ParallelDP.optimizeParallel on the
+    trial track with 1 to maxWorkers processes, on a grid of numSpeeds speeds
+    x numAngles steering angles, and checks that each gives the same states
+    as the serial vectorized Optimizer.optimize.
+    """
+    if maxWorkers is None:
+        maxWorkers = os.cpu_count()
+    interpolatedTrackData = trialTrack()
+    speedList = [15*i/(numSpeeds - 1) for i in range(numSpeeds)]
+    angles = steeringAngles(numAngles)
+    start = time.perf_counter()
+    serial = optimize(interpolatedTrackData, maxTime, speedList, angles, vectorized = True)
+    serialTime = (time.perf_counter() - start)/(maxTime - 1)
+    print("2019-20 DP, %d speeds x %d steering angles, %d CPUs:" % (numSpeeds, numAngles, os.cpu_count()))
+    print("  serial     %.4f s per time step" % serialTime)
+    for numWorkers in range(1, maxWorkers + 1):
+        start = time.perf_counter()
+        costArray = optimizeParallel(interpolatedTrackData, maxTime, speedList, angles, numWorkers)
+        seconds = (time.perf_counter() - start)/(maxTime - 1)
+        same = (np.array_equal(costArray.cost, serial.cost) and
+                np.array_equal(costArray.backPointer, serial.backPointer))
+        print("  %2d workers %.4f s per time step (%.2fx), same states: %s"
+              % (numWorkers, seconds, serialTime/seconds, same))
+
+
+def benchmarkBeam(maxTime = 15, beamWidths = (1, 2, 4, 8, 16), positionResolution = 0.25,
+                  headingResolution = 0.3):
+    """
+    Prints the pruning report of BeamDP.optimizeBeam on the trial track for
+    each beam width, without and with merging on the grid, next to its
+    runtime: the minimum final cost shows what the wider beam buys.
+    """
+    interpolatedTrackData = trialTrack()
+    print("2019-20 beam DP, %d time steps:" % maxTime)
+    print("  %5s %6s %10s %9s %8s %8s %7s %10s" % ("width", "grid", "candidates",
+          "merged", "pruned", "kept", "seconds", "cost"))
+    for grid in (None, positionResolution):
+        for beamWidth in beamWidths:
+            start = time.perf_counter()
+            store = optimizeBeam(interpolatedTrackData, maxTime, beamWidth = beamWidth,
+                                 positionResolution = grid,
+                                 headingResolution = None if grid is None else headingResolution)
+            seconds = time.perf_counter() - start
+            report = store.report()
+            print("  %5d %6s %10d %9d %8d %8d %7.3f %10.3f" % (beamWidth, grid,
+                  report["candidates"], report["merged"], report["pruned"],
+                  report["kept"], seconds, report["cost"]))
+
+
+if __name__ == "__main__":
+    benchmarkTimeStep()
+    benchmarkScaling()
+    benchmarkBeam()
@@ -0,0 +1,261 @@
+"""
+"""
+import numpy as np
+
+inf = float("inf")
+
+class DPStateStore:
+    """
+    Struct-of-arrays store of the states of the dynamic program: cost, x, y,
+    heading and distance are preallocated (T, S) float arrays indexed by
+    (time, speed index), and backPointer is a (T, S) int16 array (int32
+    above 32767 speeds) holding the speed index of the previous state at
+    time t-1, or -1.
+
+    A state takes 42 bytes, against about 270 for a CostNode object and the
+    floats it referenced, about a 6x reduction rather than tenfold: x, y,
+    heading and distance are running totals that every step adds to, so
+    storing them in float32 would accumulate rounding over the time steps
+    (and could flip the finished test against the distance to cover). The
+    only field narrowed is the back pointer, which is an exact small index.
+
+    store[t] gives the CostNode views of time t for callers that want
+    object-like access.
+    """
+    # speeds = (S,) float array of the possible speeds
+    # cost, x, y, heading, distance = (T, S) float arrays, inf if unreachable
+    # backPointer = (T, S) int16 or int32 array of previous speed indices, -1 if none
+
+    def __init__(self, maxTime, speedList, buffer = None, initialize = True):
+        """
+        Initializes a store of maxTime x len(speedList) unreachable states.
+
+        Parameter maxTime: the number of time steps
+        Precondition: maxTime is an int > 0
+
+        Parameter speedList: the possible speeds of the car
+        Precondition: speedList is a list of numbers
+
+        Optional Parameter buffer: memory to keep the arrays in, e.g. the buf
+        of a multiprocessing.shared_memory.SharedMemory, instead of new arrays
+        Precondition: buffer is None or a writable buffer of at least
+        DPStateStore.bufferSize(maxTime, len(speedList)) bytes
+
+        Optional Parameter initialize: whether to mark all the states
+        unreachable; False attaches to a buffer another store initialized
+        Precondition: initialize is a bool
+        """
+        assert maxTime > 0 and len(speedList) > 0
+        shape = (maxTime, len(speedList))
+        self.speeds = np.array(speedList, dtype=float)
+        self._speedList = list(speedList)
+        if buffer is None:
+            buffer = bytearray(DPStateStore.bufferSize(*shape))
+        size = shape[0]*shape[1]
+        # largest items first, so that every array is aligned
+        arrays = []; offset = 0
+        for dtype in (float,)*5 + (DPStateStore.indexType(shape[1]),):
+            arrays.append(np.frombuffer(buffer, dtype=dtype, count=size,
+                                        offset=offset).reshape(shape))
+            offset += arrays[-1].nbytes
+        self.cost, self.x, self.y, self.heading, self.distance, self.backPointer = arrays
+        if initialize:
+            for array in arrays[:5]:
+                array.fill(inf)
+            self.backPointer.fill(-1)
+
+    @staticmethod
+    def indexType(numSpeeds):
+        """
+        Returns the dtype of the back pointers of a store of numSpeeds speeds.
+        """
+        return np.int16 if numSpeeds <= np.iinfo(np.int16).max else np.int32
+
+    @staticmethod
+    def bufferSize(maxTime, numSpeeds):
+        """
+        Returns the number of bytes of the arrays of a store of maxTime x
+        numSpeeds states.
+        """
+        return maxTime*numSpeeds*(5*8 + np.dtype(DPStateStore.indexType(numSpeeds)).itemsize)
+
+    @property
+    def shape(self):
+        return self.cost.shape
+
+    @property
+    def nbytes(self):
+        """
+        The memory used by the arrays of the store.
+        """
+        return (self.cost.nbytes + self.x.nbytes + self.y.nbytes +
+                self.heading.nbytes + self.distance.nbytes + self.backPointer.nbytes)
+
+    def __len__(self):
+        """
+        Overrides python function "len(DPStateStore)"
+        """
+        return self.shape[0]
+
+    def __getitem__(self, time):
+        """
+        Returns the list of CostNode views of the states at time, one per speed.
+        """
+        if time < 0:
+            time += len(self)
+        if not 0 <= time < len(self):
+            raise IndexError("time out of range")
+        return [CostNode(self, time, s) for s in range(self.shape[1])]
+
+    def setColumn(self, time, cost, x, y, heading, distance, backPointer):
+        """
+        Stores the states of all speeds at time from arrays, e.g. the result
+        of VectorizedDP.dpStep.
+        """
+        self.cost[time] = cost
+        self.x[time] = x
+        self.y[time] = y
+        self.heading[time] = heading
+        self.distance[time] = distance
+        self.backPointer[time] = backPointer
+
+    def backtrace(self):
+        """
+        Returns (speedProfile, path) of the minimum cost state at the last
+        time, where speedProfile is a list of [distance, speed] and path a list
+        of [x, y], from the last time to the first.
+        """
+        speedProfile=[];path=[];
+        last = self.cost[-1]
+        if not np.isfinite(last).any():
+            return speedProfile, path
+        s = int(np.argmin(last))
+        for t in range(len(self) - 1, -1, -1):
+            path.append([float(self.x[t, s]), float(self.y[t, s])])
+            speedProfile.append([float(self.distance[t, s]), self._speedList[s]])
+            s = int(self.backPointer[t, s])
+            if s < 0:
+                break
+        return speedProfile, path
+
+
+class CostNode:
+    """
+    View of the state of a DPStateStore at a (time, speed index), with the
+    attributes of the former CostNode objects.
+    """
+    __slots__ = ('_store', '_time', '_s')
+
+    def __init__(self, store, time, s):
+        self._store = store
+        self._time = time
+        self._s = s
+
+    # get only attributes
+    @property
+    def speed(self):
+        """
+        """
+        return self._store._speedList[self._s]
+
+    @property
+    def time(self):
+        """
+        """
+        return self._time
+
+    # other getters and setters
+    @property
+    def x(self):
+        """
+        """
+        return float(self._store.x[self._time, self._s])
+
+    @x.setter
+    def x(self,x):
+        """
+        """
+        assert type(x) == float
+        self._store.x[self._time, self._s] = x
+
+    @property
+    def y(self):
+        """
+        """
+        return float(self._store.y[self._time, self._s])
+
+    @y.setter
+    def y(self,y):
+        """
+        """
+        assert type(y) == float
+        self._store.y[self._time, self._s] = y
+
+    @property
+    def distance(self):
+        """
+        """
+        return float(self._store.distance[self._time, self._s])
+
+    @distance.setter
+    def distance(self,dist):
+        """
+        """
+        assert type(dist) == float
+        self._store.distance[self._time, self._s] = dist
+
+    @property
+    def heading(self):
+        """
+        """
+        return float(self._store.heading[self._time, self._s])
+
+    @heading.setter
+    def heading(self,sa):
+        """
+        """
+        assert type(sa) == float
+        self._store.heading[self._time, self._s] = sa
+
+    @property
+    def backPointer(self):
+        """
+        """
+        s = int(self._store.backPointer[self._time, self._s])
+        if s < 0:
+            return None
+        return CostNode(self._store, self._time - 1, s)
+
+    @backPointer.setter
+    def backPointer(self,bckptr):
+        """
+        """
+        assert type(bckptr) == CostNode and bckptr._store is self._store
+        assert bckptr._time == self._time - 1
+        self._store.backPointer[self._time, self._s] = bckptr._s
+
+    @property
+    def cost(self):
+        """
+        """
+        return float(self._store.cost[self._time, self._s])
+
+    @cost.setter
+    def cost(self, cst):
+        """
+        """
+        assert type(cst) == float
+        self._store.cost[self._time, self._s] = cst
+
+    def __eq__(self, ob):
+        """
+        Overrides "==" for CostNodes
+        """
+        return (type(ob) == CostNode and self._store is ob._store and
+                self._time == ob._time and self._s == ob._s)
+
+    def __hash__(self):
+        return hash((id(self._store), self._time, self._s))
+
+    def __str__(self):
+        return "At Time "+str(self._time)+" and Speed "+str(self.speed)+" the distance covered was "+str(self.distance)+" and the (x,y,heading) coordinates were "+str((self.x,self.y,self.heading))+"."
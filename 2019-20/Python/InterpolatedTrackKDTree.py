@@ -1,8 +1,12 @@
 """
 """
 import math
+import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.neighbors import KDTree
+from TrackCorridor import TrackCorridor
+from ArcLengthIndex import ArcLengthIndex
+from AltitudeRaster import AltitudeRaster
 
 class InterpolatedTrackKDTree(KDTree):
     """
@@ -32,28 +36,81 @@ class InterpolatedTrackKDTree(KDTree):
     def distanceToCover(self):
         """
         """
-        distance = 0
-        previousPoint = self.startingPoint
-        for point in self._midTrack:
-            x = (previousPoint[0]-point[0])**2
-            y = (previousPoint[1]-point[1])**2
-            z = (previousPoint[2]-point[2])**2
-            previousPoint = point
-            distance += math.sqrt(x+y+z)
-        return distance
+        return self.arcLengthIndex().length
 
 
-    def __init__(self, innerData, outerData):
+    def __init__(self, innerData, outerData, subdivisions = 4):
         """
         """
         self._trackData = innerData + outerData
-        self._interpolatedTrackData = self._interpolate(innerData, outerData)
+        self._interpolatedTrackData = self._interpolate(innerData, outerData,
+                                                        subdivisions)
+        self._corridor = TrackCorridor(self._innerBound, self._outerBound)
+        self._arcLengthIndices = {}
+        self._altitudeRaster = None
         super().__init__(self._projectTo2D(self._interpolatedTrackData))
 
 
+    def __reduce__(self):
+        """
+        Pickles the attributes of this class along with the KDTree state, so
+        that the track can be sent to worker processes.
+        """
+        constructor, args, state = super().__reduce__()
+        return (constructor, args, (state, self.__dict__))
+
+
+    def __setstate__(self, state):
+        """
+        """
+        treeState, attributes = state
+        super().__setstate__(treeState)
+        self.__dict__.update(attributes)
+
+
+    def arcLengthIndex(self, lane = 2):
+        """
+        Returns the ArcLengthIndex of a lane of the interpolated track: 0 for
+        the inner border, 1 for the inner quarter, 2 for the middle, 3 for the
+        outer quarter and 4 for the outer border. It is built on first use.
+        """
+        assert lane in range(5)
+        if lane not in self._arcLengthIndices:
+            self._arcLengthIndices[lane] = ArcLengthIndex(self._lanes[lane])
+        return self._arcLengthIndices[lane]
+
+
+    def positionAtDistance(self, distance, lane = 2):
+        """
+        Returns (x, y, z, heading, grade) at the given distances along a lane,
+        see ArcLengthIndex.at, without any KDTree query.
+        """
+        return self.arcLengthIndex(lane).at(distance)
+
+
+    def buildAltitudeRaster(self, resolution = 0.1, maxBytes = 64*2**20):
+        """
+        Precomputes an AltitudeRaster of the track, after which getAltitude
+        and getVerticalAngle (and their batch versions) use bilinear lookups
+        into it instead of KDTree queries. Returns the raster.
+        """
+        self._altitudeRaster = AltitudeRaster(self, self._interpolatedTrackData,
+                                              resolution, maxBytes)
+        return self._altitudeRaster
+
+
+    @property
+    def altitudeRaster(self):
+        """
+        """
+        return self._altitudeRaster
+
+
     def getAltitude(self, x, y):
         """
         """
+        if self._altitudeRaster is not None:
+            return float(self._altitudeRaster.altitudeAt(x, y))
         indices = self.query([[x,y]], k=4, return_distance = False)[0]
         totalHeight = 0
         for i in indices:
@@ -61,9 +118,15 @@ class InterpolatedTrackKDTree(KDTree):
         return totalHeight/len(indices)
 
 
-    def getVerticalAngle(self,x,y):
+    def getVerticalAngle(self, x, y, heading = None):
         """
+        Without an altitude raster, returns the average angle of elevation
+        seen from the origin of the 4 nearest track points. With one, returns
+        the local vertical angle along heading, negative downhill, and raises
+        ValueError if heading is None.
         """
+        if self._altitudeRaster is not None:
+            return float(self._altitudeRaster.verticalAngleAt(x, y, heading))
         indices = self.query([[x,y]], k=4, return_distance = False)[0]
         totalOfVA = 0
         for i in indices:
@@ -76,14 +139,47 @@ class InterpolatedTrackKDTree(KDTree):
         return totalOfVA/len(indices)
 
 
+    def getAltitudes(self, X, Y):
+        """
+        Returns getAltitude(X[i], Y[i]) for arrays of points in one call.
+        """
+        X = np.asarray(X, dtype=float); Y = np.asarray(Y, dtype=float)
+        if self._altitudeRaster is not None:
+            return self._altitudeRaster.altitudeAt(X, Y)
+        points = np.column_stack((X.reshape(-1), Y.reshape(-1)))
+        indices = self.query(points, k=4, return_distance = False)
+        return self._interpolatedTrackData[indices, 2].mean(axis=1).reshape(X.shape)
+
+
+    def getVerticalAngles(self, X, Y, headings = None):
+        """
+        Returns getVerticalAngle(X[i], Y[i], headings[i]) for arrays of points
+        in one call.
+        """
+        X = np.asarray(X, dtype=float); Y = np.asarray(Y, dtype=float)
+        if self._altitudeRaster is not None:
+            return self._altitudeRaster.verticalAngleAt(X, Y, headings)
+        points = np.column_stack((X.reshape(-1), Y.reshape(-1)))
+        indices = self.query(points, k=4, return_distance = False)
+        nearest = self._interpolatedTrackData[indices]
+        rho = np.sqrt(np.sum(nearest**2, axis=2))
+        return np.arcsin(nearest[..., 2]/rho).mean(axis=1).reshape(X.shape)
+
+
     def isWithinBounds(self,x,y):
-        for i in range(len(self._innerBound)):
-            innerBoundaryPoint = self._innerBound[i]
-            outerBoundaryPoint = self._outerBound[i]
-            if not (innerBoundaryPoint[0]**2 > x**2 and innerBoundaryPoint[1]**2 > y**2) or (outerBoundaryPoint[0]**2 < x**2 and outerBoundaryPoint[1]**2 < y**2):
-                # if no for even 1, it is in bounds
-                return True
-        return False
+        """
+        Returns whether the point (x, y) is between the inner and outer
+        borders of the track.
+        """
+        return self._corridor.contains(x, y)
+
+
+    def areWithinBounds(self, X, Y):
+        """
+        Returns a bool array telling whether each point (X[i], Y[i]) is between
+        the inner and outer borders of the track.
+        """
+        return self._corridor.contains(X, Y)
 
 
     def plotBirdsEye(self, data , line = False, label = None):
@@ -105,88 +201,37 @@ class InterpolatedTrackKDTree(KDTree):
         plt.show()
 
 
-    def _interpolate(self,inside, out):
-        """
-        """
-        factor=round(len(out)/len(inside))
-        outside=[]
-        for i in range(len(inside)):
-            outside.append(out[factor*i])
-
-        mid=[];innerquart=[];outerquart=[]
-        for i in range(len(inside)):
-            mid_point=[(inside[i][0]+outside[i][0])/2,
-            (inside[i][1]+outside[i][1])/2,(inside[i][2]+outside[i][2])/2]
-            mid.append(mid_point)
-            innerquart_point=[(inside[i][0]+mid_point[0])/2,(inside[i][1]+mid_point[1])/2,
-            (inside[i][2]+mid_point[2])/2]
-            innerquart.append(innerquart_point)
-            outerquart_point=[(mid_point[0]+outside[i][0])/2,(mid_point[1]+outside[i]
-            [1])/2,(mid_point[2]+outside[i][2])/2]
-            outerquart.append(outerquart_point)
-
-        self._innerBound = inside
-        self._outerBound = outside
-        self._midTrack = mid
-
-
-        k=len(inside)-1
-        for i in range(0,4*k,4):
-            mid_secondpoint=[(mid[i][0]+mid[i+1][0])/2,(mid[i][1]+mid[i+1][1])/2,
-            (mid[i][2]+mid[i+1][2])/2]
-            mid_firstpoint=[(mid[i][0]+mid_secondpoint[0])/2,
-            (mid[i][1]+mid_secondpoint[1])/2,(mid[i][2]+mid_secondpoint[2])/2]
-            mid_thirdpoint=[(mid[i+1][0]+mid_secondpoint[0])/2,
-            (mid[i+1][1]+mid_secondpoint[1])/2,(mid[i+1][2]+mid_secondpoint[2])/2]
-            mid.insert(i+1,mid_thirdpoint)
-            mid.insert(i+1,mid_secondpoint)
-            mid.insert(i+1,mid_firstpoint)
-
-            innerquart_secondpoint=[(innerquart[i][0]+innerquart[i+1][0])/2,
-            (innerquart[i][1]+innerquart[i+1][1])/2,(innerquart[i][2]+innerquart[i+1][2])/2]
-            innerquart_firstpoint=[(innerquart[i][0]+innerquart_secondpoint[0])/2,
-            (innerquart[i][1]+innerquart_secondpoint[1])/2,(innerquart[i][2]+innerquart_secondpoint[2])/2]
-            innerquart_thirdpoint=[(innerquart[i+1][0]+innerquart_secondpoint[0])/2,
-            (innerquart[i+1][1]+innerquart_secondpoint[1])/2,(innerquart[i+1][2]+innerquart_secondpoint[2])/2]
-            innerquart.insert(i+1,innerquart_thirdpoint)
-            innerquart.insert(i+1,innerquart_secondpoint)
-            innerquart.insert(i+1,innerquart_firstpoint)
-
-            outerquart_secondpoint=[(outerquart[i][0]+outerquart[i+1][0])/2,
-            (outerquart[i][1]+outerquart[i+1][1])/2,(outerquart[i][2]+outerquart[i+1][2])/2]
-            outerquart_firstpoint=[(outerquart[i][0]+outerquart_secondpoint[0])/2,
-            (outerquart[i][1]+outerquart_secondpoint[1])/2,(outerquart[i][2]+outerquart_secondpoint[2])/2]
-            outerquart_thirdpoint=[(outerquart[i+1][0]+outerquart_secondpoint[0])/2,
-            (outerquart[i+1][1]+outerquart_secondpoint[1])/2,(outerquart[i+1][2]+outerquart_secondpoint[2])/2]
-            outerquart.insert(i+1,outerquart_thirdpoint)
-            outerquart.insert(i+1,outerquart_secondpoint)
-            outerquart.insert(i+1,outerquart_firstpoint)
-
-            inside_secondpoint=[(inside[i][0]+inside[i+1][0])/2,
-            (inside[i][1]+inside[i+1][1])/2,(inside[i][2]+inside[i+1][2])/2]
-            inside_firstpoint=[(inside[i][0]+inside_secondpoint[0])/2,
-            (inside[i][1]+inside_secondpoint[1])/2,(inside[i][2]+inside_secondpoint[2])/2]
-            inside_thirdpoint=[(inside[i+1][0]+inside_secondpoint[0])/2,
-            (inside[i+1][1]+inside_secondpoint[1])/2,(inside[i+1][2]+inside_secondpoint[2])/2]
-            inside.insert(i+1,inside_thirdpoint)
-            inside.insert(i+1,inside_secondpoint)
-            inside.insert(i+1,inside_firstpoint)
-
-            outside_secondpoint=[(outside[i][0]+outside[i+1][0])/2,
-            (outside[i][1]+outside[i+1][1])/2,(outside[i][2]+outside[i+1][2])/2]
-            outside_firstpoint=[(outside[i][0]+outside_secondpoint[0])/2,
-            (outside[i][1]+outside_secondpoint[1])/2,(outside[i][2]+outside_secondpoint[2])/2]
-            outside_thirdpoint=[(outside[i+1][0]+outside_secondpoint[0])/2,
-            (outside[i+1][1]+outside_secondpoint[1])/2,(outside[i+1][2]+outside_secondpoint[2])/2]
-            outside.insert(i+1,outside_thirdpoint)
-            outside.insert(i+1,outside_secondpoint)
-            outside.insert(i+1,outside_firstpoint)
-        return inside + innerquart + mid + outerquart + outside
+    def _interpolate(self, inside, out, subdivisions = 4):
+        """
+        Returns the (5*M, 3) array of the inner border, inner quarter, middle,
+        outer quarter and outer border lanes of the track, each densified by
+        linear interpolation to M = subdivisions*(len(inside)-1)+1 points.
+
+        The outer border is first resampled to len(inside) points by taking
+        every round(len(out)/len(inside))th point. The inputs are not modified.
+        """
+        assert subdivisions >= 1
+        inside = np.asarray(inside, dtype=float)
+        out = np.asarray(out, dtype=float)
+        factor = round(len(out)/len(inside))
+        outside = out[factor*np.arange(len(inside))]
+        mid = (inside + outside)/2
+        lanes = np.stack([inside, (inside + mid)/2, mid, (mid + outside)/2, outside])
+
+        # subdivisions points from each point (inclusive) to the next (exclusive)
+        fractions = np.arange(subdivisions)/subdivisions
+        start = lanes[:, :-1, None, :]
+        step = lanes[:, 1:, None, :] - start
+        dense = (start + step*fractions[None, None, :, None]).reshape(5, -1, 3)
+        dense = np.concatenate([dense, lanes[:, -1:, :]], axis=1)
+
+        self._lanes = dense
+        self._innerBound = dense[0]
+        self._outerBound = dense[4]
+        self._midTrack = dense[2]
+        return dense.reshape(-1, 3)
 
     def _projectTo2D(self, data):
         """
         """
-        result = []
-        for point in data:
-            result.append(point[:2])
-        return result
+        return np.asarray(data)[:, :2]
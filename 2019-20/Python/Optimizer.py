@@ -1,117 +1,10 @@
 """
 """
 import math
+import numpy as np
 from InterpolatedTrackKDTree import InterpolatedTrackKDTree
-
-class CostNode:
-    """
-    """
-    # get only attributes
-    @property
-    def speed(self):
-        """
-        """
-        return self._speed
-
-    @property
-    def time(self):
-        """
-        """
-        return self._time
-
-    # other getters and setters
-    @property
-    def x(self):
-        """
-        """
-        return self._x
-
-    @x.setter
-    def x(self,x):
-        """
-        """
-        assert type(x) == float
-        self._x = x
-
-    @property
-    def y(self):
-        """
-        """
-        return self._y
-
-    @y.setter
-    def y(self,y):
-        """
-        """
-        assert type(y) == float
-        self._y = y
-
-    @property
-    def distance(self):
-        """
-        """
-        return self._dist
-
-    @distance.setter
-    def distance(self,dist):
-        """
-        """
-        assert type(dist) == float
-        self._dist = dist
-
-    @property
-    def heading(self):
-        """
-        """
-        return self._heading
-
-    @heading.setter
-    def heading(self,sa):
-        """
-        """
-        assert type(sa) == float
-        self._heading = sa
-
-    @property
-    def backPointer(self):
-        """
-        """
-        return self._bckptr
-
-    @backPointer.setter
-    def backPointer(self,bckptr):
-        """
-        """
-        assert type(bckptr) == CostNode
-        self._bckptr = bckptr
-
-    @property
-    def cost(self):
-        """
-        """
-        return self._cost
-
-    @cost.setter
-    def cost(self, cst):
-        """
-        """
-        assert type(cst) == float
-        self._cost = cst
-
-    def __init__(self, speed, time):
-        self._speed = speed
-        self._time = time
-
-        self._cost = inf
-        self._x = inf
-        self._y = inf
-        self._heading = inf
-        self._dist = inf
-        self._bckptr = None
-
-    def __str__(self):
-        return "At Time "+str(self._time)+" and Speed "+str(self._speed)+" the distance covered was "+str(self._dist)+" and the (x,y,sa) coordinates were "+str((self._x,self._y,self._steeringAngle))+"."
-
+from VectorizedDP import dpStep
+from DPStateStore import DPStateStore, CostNode
 
 def cosd(angle):
     """
@@ -151,37 +44,80 @@ def energy(distanceCovered,averageSpeed,averageSteeringAngle,acceleration,
 
 
 inf = float("inf")
-# Trial TrackData
-inside=[];out=[];
-for i in range(0,361,10):
-    inside.append([cosd(i),sind(i),(-1)**(i//2)])
-for i in range(0,361,5):
-    out.append([6*cosd(i),2*sind(i),(-1)**(i//2)])
-interpolatedTrackData = InterpolatedTrackKDTree(inside, out)
 
-maxDistance = interpolatedTrackData.distanceToCover
-maxTime = 30
-averageDistance = maxDistance/maxTime
-speedList = list(range(16)) # list of possible speeds of the car
-steeringAngleList = []# list of possible steeringAngles of the car
-averageSpace = math.pi/36
-for i in range(36):
-    steeringAngleList.append(-math.pi/2+averageSpace*i)
-costArray = [] # array of cost nodes in column major order
-for time in range(maxTime):
-    costList = []
-    for speed in speedList:
-        costList.append(CostNode(speed,time))
-    costArray.append(costList)
-costArray[0][0].cost = 0.0
-costArray[0][0].x = interpolatedTrackData.startingPoint[0]
-costArray[0][0].y = interpolatedTrackData.startingPoint[1]
-costArray[0][0].distance = 0.0
-costArray[0][0].heading = 0.0
-# Invariant: We know the most cost efficient way to get to each speed in the
-#           at each time int time[0..t].
-t = 1
-while (t<maxTime):
+def trialTrack():
+    """
+    Returns the InterpolatedTrackKDTree of the trial track data.
+    """
+    inside=[];out=[];
+    for i in range(0,361,10):
+        inside.append([cosd(i),sind(i),(-1)**(i//2)])
+    for i in range(0,361,5):
+        out.append([6*cosd(i),2*sind(i),(-1)**(i//2)])
+    return InterpolatedTrackKDTree(inside, out)
+
+
+def steeringAngles(numAngles = 36):
+    """
+    Returns the list of possible steering angles of the car, from -pi/2 in
+    steps of pi/numAngles.
+    """
+    steeringAngleList = []# list of possible steeringAngles of the car
+    averageSpace = math.pi/numAngles
+    for i in range(numAngles):
+        steeringAngleList.append(-math.pi/2+averageSpace*i)
+    return steeringAngleList
+
+
+def initialCostArray(interpolatedTrackData, maxTime, speedList):
+    """
+    Returns the DPStateStore of maxTime x len(speedList) states with the car
+    at rest at the starting point at time 0.
+    """
+    costArray = DPStateStore(maxTime, speedList)
+    costArray[0][0].cost = 0.0
+    costArray[0][0].x = float(interpolatedTrackData.startingPoint[0])
+    costArray[0][0].y = float(interpolatedTrackData.startingPoint[1])
+    costArray[0][0].distance = 0.0
+    costArray[0][0].heading = 0.0
+    return costArray
+
+
+def optimize(interpolatedTrackData, maxTime = 30, speedList = list(range(16)),
+             steeringAngleList = None, vectorized = False, verbose = False):
+    """
+    Returns the DPStateStore of the dynamic program over time, speed and
+    steering angle for the given track.
+
+    If vectorized, each time step is evaluated by VectorizedDP.dpStep as one
+    broadcast NumPy computation instead of the nested loops below.
+    """
+    if steeringAngleList is None:
+        steeringAngleList = steeringAngles()
+    maxDistance = interpolatedTrackData.distanceToCover
+    averageDistance = maxDistance/maxTime
+    costArray = initialCostArray(interpolatedTrackData, maxTime, speedList)
+    # Invariant: We know the most cost efficient way to get to each speed in the
+    #           at each time int time[0..t].
+    t = 1
+    while (t<maxTime):
+        if vectorized:
+            _vectorizedStep(interpolatedTrackData, costArray, t, speedList,
+                            steeringAngleList, averageDistance, maxDistance)
+        else:
+            _scalarStep(interpolatedTrackData, costArray, t, steeringAngleList,
+                        averageDistance, maxDistance)
+        if verbose:
+            print(t)
+        t += 1
+    return costArray
+
+
+def _scalarStep(interpolatedTrackData, costArray, t, steeringAngleList,
+                averageDistance, maxDistance):
+    """
+    Helper function filling costArray[t] from costArray[t-1] with loops.
+    """
 #   for each speed at n
     for currentNode in costArray[t]:
         currentSpeed = currentNode.speed
@@ -201,8 +137,8 @@ while (t<maxTime):
                 if currentSpeed == 0:
                     minCost = previousCost
                     minHeading = 0.0
-                    minX = previousX
-                    minY = previousY
+                    minX = previousNode.x
+                    minY = previousNode.y
                 else:
                     minCost = inf
                     minHeading = inf
@@ -223,7 +159,7 @@ while (t<maxTime):
                     if interpolatedTrackData.isWithinBounds(currentX,currentY):
                         averageX = (currentX + previousX)/2
                         averageY = (currentY + previousY)/2
-                        verticalAngle = interpolatedTrackData.getVerticalAngle(averageX,averageY)
+                        verticalAngle = interpolatedTrackData.getVerticalAngle(averageX,averageY,newHeading)
 #                       find the cost of reaching current (x,y) from  previous (x,y) at given speed and steering angle
                         e = energy(distanceCovered,averageSpeed,newHeading,acceleration,verticalAngle)
                         cost = previousCost + e + distanceFactorInCost
@@ -241,28 +177,41 @@ while (t<maxTime):
                 superMinX = minX
                 superMinY = minY
                 superMinDistance = currentDistance
+        if superMinCost == inf:
+            continue # unreachable
         currentNode.cost = superMinCost
         currentNode.distance = superMinDistance
         currentNode.x = superMinX
         currentNode.y = superMinY
         currentNode.heading = superMinHeading
         currentNode.backPointer = superBackPointer
-    print(t)
-    t += 1
 
-# find minimum cost at maxTime
-minCost = inf
-for costNode in costArray[maxTime-1]:
-    if costNode.cost<minCost:
-        minCost = costNode.cost
-        resultNode = costNode
-# backtrace path
-speedProfile=[];path=[];
-while resultNode != None:
-    path.append([resultNode.x,resultNode.y])
-    speedProfile.append([resultNode.distance,resultNode.speed])
-    resultNode = resultNode.backPointer
 
-interpolatedTrackData.plotBirdsEye(interpolatedTrackData.interpolatedTrackData)
-interpolatedTrackData.plotBirdsEye(speedProfile, True)
-interpolatedTrackData.plotBirdsEye(path)
+def _vectorizedStep(interpolatedTrackData, costArray, t, speedList,
+                    steeringAngleList, averageDistance, maxDistance):
+    """
+    Helper function filling costArray[t] from costArray[t-1] with dpStep.
+    """
+    costArray.setColumn(t, *dpStep(interpolatedTrackData,
+        costArray.cost[t-1], costArray.x[t-1], costArray.y[t-1],
+        costArray.heading[t-1], costArray.distance[t-1],
+        costArray.speeds, costArray.speeds,
+        np.array(steeringAngleList), averageDistance, maxDistance))
+
+
+def backtrace(costArray):
+    """
+    Returns (speedProfile, path) of the minimum cost state at the last time,
+    where speedProfile is a list of [distance, speed] and path a list of
+    [x, y], from the last time to the first.
+    """
+    return costArray.backtrace()
+
+
+if __name__ == "__main__":
+    interpolatedTrackData = trialTrack()
+    costArray = optimize(interpolatedTrackData, verbose = True)
+    speedProfile, path = backtrace(costArray)
+    interpolatedTrackData.plotBirdsEye(interpolatedTrackData.interpolatedTrackData)
+    interpolatedTrackData.plotBirdsEye(speedProfile, True)
+    interpolatedTrackData.plotBirdsEye(path)
@@ -0,0 +1,101 @@
+"""
+"""
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from VectorizedDP import dpStep
+from DPStateStore import DPStateStore
+from Optimizer import initialCostArray, steeringAngles
+
+# state of each worker process, set once by _initWorker
+_worker = {}
+
+def _initWorker(name, maxTime, speedList, interpolatedTrackData, steeringAngleList,
+                averageDistance, maxDistance):
+    """
+    Helper function run once in each worker: attaches to the shared store and
+    keeps the track, which is pickled only once per worker.
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    _worker["memory"] = memory
+    _worker["store"] = DPStateStore(maxTime, speedList, memory.buf, initialize = False)
+    _worker["track"] = interpolatedTrackData
+    _worker["steeringAngles"] = np.array(steeringAngleList)
+    _worker["averageDistance"] = averageDistance
+    _worker["maxDistance"] = maxDistance
+
+
+def _workerStep(task):
+    """
+    Helper function computing the states at time t of the speed indices
+    [lo, hi) from the states at time t-1, in the shared store.
+    """
+    t, lo, hi = task
+    store = _worker["store"]
+    result = dpStep(_worker["track"], store.cost[t-1], store.x[t-1], store.y[t-1],
+                    store.heading[t-1], store.distance[t-1], store.speeds,
+                    store.speeds[lo:hi], _worker["steeringAngles"],
+                    _worker["averageDistance"], _worker["maxDistance"])
+    for array, column in zip((store.cost, store.x, store.y, store.heading,
+                              store.distance, store.backPointer), result):
+        array[t, lo:hi] = column
+
+
+def optimizeParallel(interpolatedTrackData, maxTime = 30, speedList = list(range(16)),
+                     steeringAngleList = None, numWorkers = None, context = None):
+    """
+    Returns the DPStateStore of Optimizer.optimize computed by a pool of
+    worker processes.
+
+    Within a time step every current speed only depends on the previous
+    column, so the speed grid is split into one slice per worker and each
+    worker runs VectorizedDP.dpStep on its slice. The store lives in shared
+    memory: workers read the previous column and write their slice of the
+    current one in place, so no state is pickled between steps.
+
+    Optional Parameter numWorkers: the number of worker processes, by
+    default the number of CPUs
+    Precondition: numWorkers is None or an int > 0
+
+    Optional Parameter context: the multiprocessing start method, e.g.
+    "spawn" or "fork", by default the platform default
+    Precondition: context is None or a start method name
+    """
+    if steeringAngleList is None:
+        steeringAngleList = steeringAngles()
+    if numWorkers is None:
+        numWorkers = multiprocessing.cpu_count()
+    assert numWorkers > 0
+    maxDistance = interpolatedTrackData.distanceToCover
+    averageDistance = maxDistance/maxTime
+    numSpeeds = len(speedList)
+    bounds = np.linspace(0, numSpeeds, min(numWorkers, numSpeeds) + 1).astype(int)
+    slices = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    memory = shared_memory.SharedMemory(create=True,
+                                        size=DPStateStore.bufferSize(maxTime, numSpeeds))
+    try:
+        shared = None
+        try:
+            shared = DPStateStore(maxTime, speedList, memory.buf)
+            initial = initialCostArray(interpolatedTrackData, 1, speedList)
+            shared.setColumn(0, initial.cost[0], initial.x[0], initial.y[0],
+                             initial.heading[0], initial.distance[0], initial.backPointer[0])
+            pool = multiprocessing.get_context(context).Pool(numWorkers, _initWorker,
+                (memory.name, maxTime, speedList, interpolatedTrackData,
+                 steeringAngleList, averageDistance, maxDistance))
+            with pool:
+                for t in range(1, maxTime):
+                    pool.map(_workerStep, [(t, lo, hi) for lo, hi in slices])
+            # copy the result out of the shared memory before releasing it
+            store = DPStateStore(maxTime, speedList)
+            for name in ("cost", "x", "y", "heading", "distance", "backPointer"):
+                getattr(store, name)[...] = getattr(shared, name)
+        finally:
+            # the views of the buffer must be gone for close not to raise
+            # BufferError over the original exception
+            del shared
+            memory.close()
+    finally:
+        memory.unlink()
+    return store
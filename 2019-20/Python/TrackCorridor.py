@@ -0,0 +1,105 @@
+"""
+"""
+import numpy as np
+
+class TrackCorridor:
+    """
+    Index of the region between the inner and outer border of a track for
+    exact, vectorized point-in-track tests.
+
+    Both borders are closed polygons and a point is in the track iff a ray
+    from it crosses their edges an odd number of times (even-odd rule). The
+    edges are bucketed into horizontal bands so that a point is only tested
+    against the edges of its own band instead of every boundary point.
+    """
+    # _x1, _y1, _x2, _y2 = coordinates of the ends of every edge
+    # _yMin, _bandHeight, _numBands = position of the bands
+    # _bandEdges = (numBands, K) edge indices of every band, padded with -1
+
+    def __init__(self, innerBound, outerBound, numBands = None):
+        """
+        Creates the index of the track between innerBound and outerBound.
+
+        Parameter innerBound, outerBound: the points of the borders, in order
+        Precondition: innerBound and outerBound are array-likes of shape (n, 2)
+        or (n, 3) with n >= 3
+
+        Optional Parameter numBands: the number of horizontal bands, by default
+        a quarter of the number of edges
+        Precondition: numBands is None or an int > 0
+        """
+        starts = []; ends = []
+        for ring in (innerBound, outerBound):
+            ring = np.asarray(ring, dtype=float)[:, :2]
+            assert len(ring) >= 3
+            starts.append(ring)
+            ends.append(np.roll(ring, -1, axis=0)) # closes the polygon
+        start = np.concatenate(starts); end = np.concatenate(ends)
+        self._x1, self._y1 = start[:, 0], start[:, 1]
+        self._x2, self._y2 = end[:, 0], end[:, 1]
+        numEdges = len(start)
+        if numBands is None:
+            numBands = max(1, numEdges//4)
+        self._numBands = numBands
+        self._yMin = float(min(self._y1.min(), self._y2.min()))
+        yMax = float(max(self._y1.max(), self._y2.max()))
+        self._bandHeight = max(yMax - self._yMin, 1e-12)/numBands
+
+        # CSR lists of the edges overlapping each band, then padded to a table
+        firstBand = self._band(np.minimum(self._y1, self._y2))
+        lastBand = self._band(np.maximum(self._y1, self._y2))
+        counts = lastBand - firstBand + 1
+        edges = np.repeat(np.arange(numEdges), counts)
+        offsets = np.repeat(np.cumsum(counts) - counts, counts)
+        bands = np.repeat(firstBand, counts) + np.arange(len(edges)) - offsets
+        perBand = np.bincount(bands, minlength=numBands)
+        order = np.argsort(bands, kind='stable')
+        slot = np.arange(len(edges)) - np.repeat(np.cumsum(perBand) - perBand, perBand)
+        self._bandEdges = np.full((numBands, max(1, perBand.max())), -1, dtype=np.int64)
+        self._bandEdges[bands[order], slot] = edges[order]
+
+    def _band(self, y):
+        """
+        Helper function returning the band index of each y, clipped to the
+        bands
+        """
+        band = np.floor((y - self._yMin)/self._bandHeight).astype(np.int64)
+        return np.clip(band, 0, self._numBands - 1)
+
+    def contains(self, x, y, chunkSize = 65536):
+        """
+        Returns whether each point (x, y) is in the track: a bool for scalar
+        x and y, a bool array of their broadcast shape otherwise.
+
+        Parameter x, y: the coordinates of the points
+        Precondition: x and y are numbers or broadcastable arrays
+
+        Optional Parameter chunkSize: the number of points tested at once, to
+        bound memory
+        Precondition: chunkSize is an int > 0
+        """
+        X, Y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        shape = X.shape
+        X = X.reshape(-1); Y = Y.reshape(-1)
+        result = np.zeros(len(X), dtype=bool)
+        for lo in range(0, len(X), chunkSize):
+            result[lo:lo+chunkSize] = self._contains(X[lo:lo+chunkSize], Y[lo:lo+chunkSize])
+        if shape == ():
+            return bool(result[0])
+        return result.reshape(shape)
+
+    def _contains(self, X, Y):
+        """
+        Helper function for contains on 1-D arrays of points
+        """
+        edges = self._bandEdges[self._band(Y)]
+        valid = edges >= 0
+        edges = np.where(valid, edges, 0)
+        x1 = self._x1[edges]; y1 = self._y1[edges]
+        x2 = self._x2[edges]; y2 = self._y2[edges]
+        py = Y[:, None]
+        straddles = valid & ((y1 > py) != (y2 > py))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xCrossing = x1 + (py - y1)*(x2 - x1)/(y2 - y1)
+        crossings = straddles & (X[:, None] < xCrossing)
+        return (crossings.sum(axis=1) % 2 == 1) & np.isfinite(X) & np.isfinite(Y)
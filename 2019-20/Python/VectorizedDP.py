@@ -0,0 +1,130 @@
+"""
+"""
+import numpy as np
+
+inf = float("inf")
+
+def energyArray(distanceCovered, averageSpeed, averageSteeringAngle, acceleration,
+                verticalAngle):
+    """
+    Returns Optimizer.energy evaluated elementwise on broadcastable arrays.
+    """
+    mass = 96; gravity = 9.8; airResistance = 0.01; rollingResistance = 0.03
+    corneringResistance = 0
+
+    forceExerted = mass*acceleration + airResistance*averageSpeed**2 + rollingResistance*mass*gravity*np.cos(verticalAngle) + mass*gravity*np.sin(verticalAngle) + corneringResistance*averageSteeringAngle
+    energySpent = distanceCovered*forceExerted
+    return np.where(energySpent < 0, 0.0, energySpent)
+
+
+def candidateStates(interpolatedTrackData, previousCost, previousX, previousY,
+                    previousHeading, previousDistance, speeds, currentSpeeds,
+                    steeringAngles, averageDistance, maxDistance):
+    """
+    Returns (c, p, cost, x, y, heading, distance, finished) of every
+    candidate state of a time step of Optimizer.optimize: each steering angle
+    of each live pair of a current speed and a previous state.
+
+    c and p are the (L,) indices into currentSpeeds and the previous states
+    of the live pairs, those whose previous state is reachable and whose car
+    has not finished, and cost, x, y and heading the (L, A) cost and state
+    of each of their steering angles, cost inf out of bounds. distance and
+    finished are the (C, P) distance covered by every pair and whether it
+    is past maxDistance. The candidates are evaluated as one broadcast
+    computation: positions, a batch bounds test, a batch vertical angle
+    query along the new heading for the candidates in bounds and the energy.
+
+    See dpStep for the parameters.
+    """
+    currentSpeed = currentSpeeds[:, None]
+    averageSpeed = (currentSpeed + speeds[None, :])/2 # (C, P)
+    acceleration = (currentSpeed - speeds[None, :]) # as time = 1
+    distanceCovered = averageSpeed # as time = 1
+    currentDistance = previousDistance[None, :] + distanceCovered
+    distanceFactorInCost = (averageDistance-distanceCovered)**2
+    finished = currentDistance > maxDistance
+    live = ~finished & np.isfinite(previousCost)[None, :]
+
+    c, p = np.nonzero(live)
+    newHeading = previousHeading[p][:, None] + steeringAngles[None, :] # (L, A)
+    covered = distanceCovered[c, p][:, None]
+    currentX = previousX[p][:, None] + covered*np.cos(newHeading)
+    currentY = previousY[p][:, None] + covered*np.sin(newHeading)
+    candidateCost = np.full(newHeading.shape, inf)
+    inBounds = interpolatedTrackData.areWithinBounds(currentX, currentY)
+    l, a = np.nonzero(inBounds)
+    if len(l):
+        averageX = (currentX[l, a] + previousX[p[l]])/2
+        averageY = (currentY[l, a] + previousY[p[l]])/2
+        verticalAngle = interpolatedTrackData.getVerticalAngles(averageX, averageY,
+                                                                  newHeading[l, a])
+        e = energyArray(distanceCovered[c[l], p[l]], averageSpeed[c[l], p[l]],
+                        newHeading[l, a], acceleration[c[l], p[l]], verticalAngle)
+        candidateCost[l, a] = previousCost[p[l]] + e + distanceFactorInCost[c[l], p[l]]
+    return c, p, candidateCost, currentX, currentY, newHeading, currentDistance, finished
+
+
+def dpStep(interpolatedTrackData, previousCost, previousX, previousY,
+           previousHeading, previousDistance, speeds, currentSpeeds,
+           steeringAngles, averageDistance, maxDistance):
+    """
+    Returns (cost, x, y, heading, distance, backPointer) arrays of the best
+    state at each of currentSpeeds, given the states at each of speeds one
+    time step earlier.
+
+    This is one time step of Optimizer.optimize with all current speed x
+    previous speed x steering angle candidates of candidateStates evaluated
+    at once. Ties are broken like the loops, by the first steering angle and
+    then the first previous speed. backPointer is the index into speeds of
+    the previous state, or -1 (with infinite cost) if the current speed
+    cannot be reached.
+
+    Parameter interpolatedTrackData: the track
+    Precondition: interpolatedTrackData is an InterpolatedTrackKDTree
+
+    Parameter previousCost, previousX, previousY, previousHeading,
+    previousDistance: the state at each previous speed
+    Precondition: these are (P,) float arrays, cost inf if unreachable
+
+    Parameter speeds: the previous speeds
+    Precondition: speeds is a (P,) float array
+
+    Parameter currentSpeeds: the speeds to compute the states of
+    Precondition: currentSpeeds is a (C,) float array
+
+    Parameter steeringAngles: the possible steering angles
+    Precondition: steeringAngles is a (A,) float array
+
+    Parameter averageDistance, maxDistance: the distance to cover per time
+    step on average and in total
+    Precondition: averageDistance and maxDistance are floats
+    """
+    c, p, candidateCost, currentX, currentY, newHeading, currentDistance, finished = \
+        candidateStates(interpolatedTrackData, previousCost, previousX, previousY,
+                        previousHeading, previousDistance, speeds, currentSpeeds,
+                        steeringAngles, averageDistance, maxDistance)
+
+    # best steering angle of each pair
+    C, P = finished.shape
+    minCost = np.where(finished & (currentSpeeds[:, None] == 0), previousCost[None, :], inf)
+    minHeading = np.zeros((C, P)); minX = np.broadcast_to(previousX, (C, P)).copy()
+    minY = np.broadcast_to(previousY, (C, P)).copy()
+    if len(c):
+        bestAngle = np.argmin(candidateCost, axis=1)
+        rows = np.arange(len(c))
+        minCost[c, p] = candidateCost[rows, bestAngle]
+        minHeading[c, p] = newHeading[rows, bestAngle]
+        minX[c, p] = currentX[rows, bestAngle]
+        minY[c, p] = currentY[rows, bestAngle]
+
+    # best previous speed of each current speed
+    backPointer = np.argmin(minCost, axis=1)
+    rows = np.arange(C)
+    cost = minCost[rows, backPointer]
+    reachable = cost < inf
+    backPointer = np.where(reachable, backPointer, -1)
+    x = np.where(reachable, minX[rows, backPointer], inf)
+    y = np.where(reachable, minY[rows, backPointer], inf)
+    heading = np.where(reachable, minHeading[rows, backPointer], inf)
+    distance = np.where(reachable, currentDistance[rows, backPointer], inf)
+    return cost, x, y, heading, distance, backPointer
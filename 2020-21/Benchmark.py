@@ -0,0 +1,307 @@
+import math
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from TrackGraph import *
+from TrackNodeKDTree import *
+import SpeedProfileFinder
+from TrackGenerators import ellipseTrack
+from PlanningBundle import buildBundle, loadBundle
+from JointPlanner import jointPlan
+from CostToGoTable import CostToGoTable
+from Telemetry import Sample, LatencyHistogram, singleBatches, nodeSpeeds, recommend
+
+def benchmarkEdgeWeights(numStations = 10000):
+    """
+    Times the scalar energy loop of createGraph against edgeWeights on an
+    elliptical track and prints the speedup and the largest difference.
+    """
+    arrayList = interpolate(*ellipseTrack(numStations))
+    numArrs = len(arrayList)
+    start = time.perf_counter()
+    scalar = np.empty((numStations, numArrs, numArrs))
+    nodes = [[TrackNode(*point) for point in points] for points in arrayList]
+    for i in range(numStations):
+        for a in range(numArrs):
+            for b in range(numArrs):
+                scalar[i, a, b] = energy(nodes[a][i], nodes[b][(i+1) % numStations], 5)
+    scalarTime = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = edgeWeights(arrayList, 5)
+    vectorizedTime = time.perf_counter() - start
+    error = np.max(np.abs(vectorized - scalar)/np.maximum(np.abs(scalar), 1))
+    print("edge weights, %d stations x %d lanes:" % (numStations, numArrs))
+    print("  scalar     %.3f s" % scalarTime)
+    print("  vectorized %.3f s (%.0fx)" % (vectorizedTime, scalarTime/vectorizedTime))
+    print("  max relative difference %.2e" % error)
+
+
+def _queueWorkload(queue, keys, priorities, updates):
+    """
+    Helper function that adds every key, applies the (key, priority) updates
+    and polls the queue empty.
+    """
+    for key, priority in zip(keys, priorities):
+        queue.add(key, priority)
+    for key, priority in updates:
+        queue.updatePriority(key, priority)
+    while len(queue) != 0:
+        queue.poll()
+
+
+def benchmarkQueues(numKeys = 100000, numUpdates = 200000, numStations = 2000):
+    """
+    Times TrackNodeHeap, LazyHeapQueue and IndexedDaryHeap on the same
+    add/updatePriority/poll workload, then times optimumPath with each backend
+    on an elliptical track.
+    """
+    rng = random.Random(0)
+    priorities = [rng.random()*1000 for _ in range(numKeys)]
+    decreases = []
+    current = list(priorities)
+    for _ in range(numUpdates):
+        key = rng.randrange(numKeys)
+        current[key] *= rng.random()
+        decreases.append((key, current[key]))
+    nodes = [TrackNode(0, 0, 0) for _ in range(numKeys)]
+    workloads = [
+        ("TrackNodeHeap", lambda: TrackNodeHeap(False), nodes),
+        ("heapq", lambda: LazyHeapQueue(False), list(range(numKeys))),
+        ("dary", lambda: IndexedDaryHeap(numKeys), list(range(numKeys)))]
+    print("queue micro-benchmark, %d keys, %d decrease-keys:" % (numKeys, numUpdates))
+    for name, factory, keys in workloads:
+        updates = [(keys[key], priority) for key, priority in decreases]
+        start = time.perf_counter()
+        _queueWorkload(factory(), keys, priorities, updates)
+        print("  %-13s %.3f s" % (name, time.perf_counter() - start))
+
+    arrayList = interpolate(*ellipseTrack(numStations))
+    objectTree = TrackNodeKDTree(createGraph(arrayList))
+    compactTree = TrackNodeKDTree(createCompactGraph(arrayList))
+    searches = [("trackNodeHeap", objectTree, "dijkstra", "trackNodeHeap"),
+                ("heapq", compactTree, "dijkstra", "heapq"),
+                ("dary", compactTree, "dijkstra", "dary"),
+                ("stations", compactTree, "stations", None)]
+    # from just past the start line to just before it, i.e. almost a full lap
+    first = arrayList[2][1][:2]; last = arrayList[2][-1][:2]
+    print("optimumPath, %d stations x %d lanes:" % (numStations, len(arrayList)))
+    for name, kdTree, method, queue in searches:
+        start = time.perf_counter()
+        path, energy = optimumPath(kdTree, first, last, method, queue)
+        print("  %-13s %.3f s (energy %.3f)" % (name, time.perf_counter() - start, energy))
+
+
+def benchmarkAStar(numStations = 2000, fractions = (0.05, 0.25, 0.5, 0.9)):
+    """
+    Prints the nodes settled and the time taken by Dijkstra and A* for
+    queries from the start line to the middle lane a given fraction of a lap
+    ahead on an elliptical track.
+    """
+    arrayList = interpolate(*ellipseTrack(numStations))
+    kdTree = TrackNodeKDTree(createCompactGraph(arrayList))
+    first = arrayList[2][0][:2]
+    print("A* vs Dijkstra, %d stations x %d lanes:" % (numStations, len(arrayList)))
+    for fraction in fractions:
+        goal = arrayList[2][int(fraction*numStations)][:2]
+        times = []
+        for method in ("dijkstra", "astar"):
+            start = time.perf_counter()
+            optimumPath(kdTree, first, goal, method, "heapq")
+            times.append(time.perf_counter() - start)
+        report = searchReport(kdTree, first, goal)
+        print("  %3.0f%% of a lap: settled %6d vs %6d, %.3f s vs %.3f s" %
+              (100*fraction, report["dijkstraSettled"], report["astarSettled"],
+               times[0], times[1]))
+
+
+def benchmarkSpeedProfile(sizes = (50, 100), k = 50, tmax = 60):
+    """
+    Prints the cost evaluations, time and cost of
+    SpeedProfileFinder.optimizeSpeedProfile with the analytic gradient and
+    with finite differences on an ellipse with a rolling elevation, for
+    speed profiles of each size.
+    """
+    print("speed profile, energy + %g*(time-%g)^2:" % (k, tmax))
+    for n in sizes:
+        t = np.linspace(0, 2*math.pi, n+2)
+        X = 50*np.cos(t); Y = 30*np.sin(t); Z = 3*np.sin(2*t)
+        for analytic in (True, False):
+            start = time.perf_counter()
+            result = SpeedProfileFinder.optimizeSpeedProfile(X, Y, Z, 96, 9.8, 0.03675,
+                                                             0.01, k, tmax, analytic = analytic)
+            print("  n=%4d %-17s %7d evaluations, %.3f s, cost %.3f" %
+                  (n, "analytic" if analytic else "finite difference", result.nfev,
+                   time.perf_counter() - start, result.fun))
+
+
+def benchmarkEnergyBatch(numProfiles = 20000, n = 500):
+    """
+    Times SpeedProfileFinder.energy in a loop over numProfiles random speed
+    profiles against one SpeedProfileFinder.energyBatch call.
+    """
+    t = np.linspace(0, 2*math.pi, n+2)
+    X = 50*np.cos(t); Y = 30*np.sin(t); Z = 3*np.sin(2*t)
+    SP = np.random.default_rng(0).uniform(0, 10, (numProfiles, n))
+    start = time.perf_counter()
+    loop = np.array([SpeedProfileFinder.energy(X, Y, Z, row, 96, 9.8, 0.03675, 0.01) for row in SP])
+    loopTime = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = SpeedProfileFinder.energyBatch(X, Y, Z, SP, 96, 9.8, 0.03675, 0.01)
+    batchTime = time.perf_counter() - start
+    print("speed profile energy, %d profiles x %d speeds:" % (numProfiles, n))
+    print("  loop  %.3f s" % loopTime)
+    print("  batch %.3f s (%.1fx)" % (batchTime, loopTime/batchTime))
+    print("  max relative difference %.2e" % np.max(np.abs(batch - loop)/np.maximum(np.abs(loop), 1)))
+
+
+def benchmarkMultiLap(numStations = 2000, laps = (1, 10, 100)):
+    """
+    Prints the time and energy of multiLapSweep and of the speed profile
+    solver for races of several laps of an elliptical track, whose geometry
+    is stored once whatever the number of laps.
+    """
+    arrayList = interpolate(*ellipseTrack(numStations))
+    graph = createCompactGraph(arrayList)
+    start = 2; end = (numStations - 1)*graph.numArrs + 2
+    print("multi-lap, %d stations x %d lanes (graph %d bytes):" %
+          (numStations, graph.numArrs, graph.nbytes))
+    for numLaps in laps:
+        begin = time.perf_counter()
+        path, energy = multiLapSweep(graph, start, end, numLaps)
+        print("  %4d laps: graph   %.3f s, energy %.3f" %
+              (numLaps, time.perf_counter() - begin, energy))
+    t = np.linspace(0, 2*math.pi, 101)
+    X = 50*np.cos(t); Y = 30*np.sin(t); Z = 3*np.sin(2*t)
+    lapLength = np.sum(SpeedProfileFinder.geometry(X, Y, Z)[0])
+    for numLaps in laps:
+        # start at the average speed of a 60 s lap
+        SP0 = np.full(numLaps*(len(Z) - 1) - 1, lapLength/60)
+        begin = time.perf_counter()
+        result = SpeedProfileFinder.optimizeSpeedProfile(X, Y, Z, 96, 9.8, 0.03675, 0.01,
+                                                         50, 60*numLaps, SP0,
+                                                         numLaps = numLaps)
+        print("  %4d laps: profile %.3f s, cost per lap %.3f, %d evaluations" %
+              (numLaps, time.perf_counter() - begin, result.fun/numLaps, result.nfev))
+
+
+def benchmarkBundle(numStations = 20000):
+    """
+    Times building the graph, KDTree and cost-to-go table of an elliptical
+    track and saving them as a planning bundle against loading the bundle
+    and answering a first query. The bundle is written to a temporary
+    directory that is removed afterwards.
+    """
+    inside, out = ellipseTrack(numStations)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "bundle.trk")
+        start = time.perf_counter()
+        buildBundle(filename, inside, out, finish = 0)
+        buildTime = time.perf_counter() - start
+        start = time.perf_counter()
+        graphKDTree, table = loadBundle(filename)
+        loadTime = time.perf_counter() - start
+        start = time.perf_counter()
+        table.replan(graphKDTree, inside[numStations//2][:2])
+        queryTime = time.perf_counter() - start
+        # unmap the bundle before its file is deleted
+        del graphKDTree, table
+    print("planning bundle, %d stations:" % numStations)
+    print("  build and save %.4f s" % buildTime)
+    print("  load           %.4f s" % loadTime)
+    print("  first replan   %.4f s" % queryTime)
+
+
+def benchmarkConfigSweep(numStations = 2000, speeds = tuple(range(1, 17))):
+    """
+    Times a sweep of optimumPath over several speeds by rebuilding the graph
+    for each speed against one weightTensor and a config index per query.
+    """
+    arrayList = interpolate(*ellipseTrack(numStations))
+    first = arrayList[2][1][:2]; last = arrayList[2][-1][:2]
+    start = time.perf_counter()
+    for v in speeds:
+        graph = createCompactGraph(arrayList)
+        graph.weights = edgeWeights(arrayList, v).reshape(-1)
+        optimumPath(TrackNodeKDTree(graph), first, last, "stations")
+    rebuildTime = time.perf_counter() - start
+    start = time.perf_counter()
+    graph = createCompactGraph(arrayList)
+    kdTree = TrackNodeKDTree(graph)
+    useConfigs(graph, [VehicleConfig(v = v) for v in speeds])
+    for c in range(len(speeds)):
+        optimumPath(kdTree, first, last, "stations", config = c)
+    tensorTime = time.perf_counter() - start
+    print("speed sweep, %d speeds, %d stations x %d lanes:" %
+          (len(speeds), numStations, len(arrayList)))
+    print("  rebuild per speed %.3f s" % rebuildTime)
+    print("  weight tensor     %.3f s (%.1fx)" % (tensorTime, rebuildTime/tensorTime))
+
+
+def benchmarkJoint(numStations = 2000, numSpeeds = 30, maxTimes = (None, 60, 40)):
+    """
+    Prints the time, energy and race time of jointPlan for a full lap of an
+    elliptical track with 5 lanes and numSpeeds speeds from 0 to 15, with
+    each time limit.
+    """
+    arrayList = interpolate(*ellipseTrack(numStations, a = 50, b = 30, width = 5))
+    graph = createCompactGraph(arrayList)
+    speeds = np.linspace(0, 15, numSpeeds)
+    start = 2; end = (numStations - 1)*graph.numArrs + 2
+    print("joint lane and speed planning, %d stations x %d lanes x %d speeds:" %
+          (numStations, graph.numArrs, numSpeeds))
+    for maxTime in maxTimes:
+        begin = time.perf_counter()
+        path, speedProfile, energy, raceTime = jointPlan(graph, start, end, speeds, maxTime)
+        print("  time limit %-5s %.3f s, energy %.3f, race time %.3f s" %
+              (maxTime, time.perf_counter() - begin, energy, raceTime))
+
+
+def benchmarkTelemetry(numStations = 500, numSpeeds = 16, numSamples = 20000, batchSize = 32):
+    """
+    Prints the latency percentiles of recommend for numSamples noisy samples
+    around the jointPlan lap of an elliptical track, one sample per batch and
+    batchSize samples per batch, with the table and speeds of that plan.
+    """
+    arrayList = interpolate(*ellipseTrack(numStations, a = 50, b = 30, width = 5))
+    graph = createCompactGraph(arrayList)
+    graphKDTree = TrackNodeKDTree(graph)
+    speeds = np.linspace(0, 15, numSpeeds)
+    path, speedProfile, energy, raceTime = jointPlan(graph, 2, 2, speeds)
+    table = CostToGoTable.fromPath(graph, path)
+    targets = nodeSpeeds(graph, path, speedProfile)
+    random.seed(0)
+    samples = []
+    for i in range(numSamples):
+        step = random.randrange(len(path) - 1)
+        x0, y0 = graph.coordinates[path[step], :2]
+        x1, y1 = graph.coordinates[path[step + 1], :2]
+        heading = math.atan2(y1 - y0, x1 - x0) % (2*math.pi)
+        samples.append(Sample(i*0.01, x0 + random.gauss(0, 0.3),
+                              y0 + random.gauss(0, 0.3), heading))
+    print("telemetry, %d stations x %d lanes, %d samples:" %
+          (numStations, graph.numArrs, numSamples))
+    batchings = (("1 per batch", singleBatches(samples)),
+                 ("%d per batch" % batchSize,
+                  ([(sample, time.perf_counter()) for sample in samples[i:i+batchSize]]
+                   for i in range(0, numSamples, batchSize))))
+    for name, batches in batchings:
+        histogram = LatencyHistogram()
+        for recommendation in recommend(batches, graphKDTree, table, targets, histogram):
+            assert recommendation.nextNode < 0 or not math.isnan(recommendation.targetSpeed)
+        print("  %-13s p50 <= %.1f us, p99 <= %.1f us" % (name,
+              histogram.percentile(50)*1e6, histogram.percentile(99)*1e6))
+
+
+if __name__ == "__main__":
+    benchmarkEdgeWeights()
+    benchmarkQueues()
+    benchmarkAStar()
+    benchmarkSpeedProfile()
+    benchmarkEnergyBatch()
+    benchmarkMultiLap()
+    benchmarkBundle()
+    benchmarkConfigSweep()
+    benchmarkJoint()
+    benchmarkTelemetry()
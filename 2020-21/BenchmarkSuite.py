@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+from TrackGraph import *
+from TrackNodeKDTree import *
+import SpeedProfileFinder
+from TrackGenerators import GENERATORS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DP_DIRECTORY = os.path.join(HERE, os.pardir, "2019-20", "Python")
+BASELINE = os.path.join(HERE, "benchmarkBaseline.json")
+RESULTS_VERSION = 2
+
+# the tracks of each profile: generators x stations x lanes
+PROFILES = {
+    "quick": {"generators": list(GENERATORS), "stations": [100, 1000],
+              "lanes": [3, 5], "repeat": 7},
+    "full": {"generators": list(GENERATORS), "stations": [100, 1000, 10000, 100000],
+             "lanes": [3, 5, 11, 21], "repeat": 7}}
+
+def _timed(function, repeat):
+    """
+    Helper function returning (seconds, result) of function, where seconds is
+    the median over repeat calls after an untimed warm-up call
+    """
+    function()
+    seconds = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds)), result
+
+
+def _dpSeconds(generator, numStations, maxTime, repeat, numWorkers = None):
+    """
+    Helper function returning the median seconds over repeat runs, after a
+    warm-up run, of the vectorized 2019-20 DP on a
+    generated track, or of ParallelDP.optimizeParallel with numWorkers
+    processes if given, run in a separate interpreter because the 2019-20
+    modules share names with these ones, or None if it cannot run there, in
+    which case the last lines of its error output are printed
+    """
+    if numWorkers is None:
+        run = "optimize(track, %d, vectorized = True)" % maxTime
+    else:
+        run = "optimizeParallel(track, %d, numWorkers = %d)" % (maxTime, numWorkers)
+    code = ("import json, statistics, sys, time\n"
+            "sys.path[:0] = [%r, %r]\n"
+            "from TrackGenerators import GENERATORS\n"
+            "from InterpolatedTrackKDTree import InterpolatedTrackKDTree\n"
+            "from Optimizer import optimize\n"
+            "from ParallelDP import optimizeParallel\n"
+            "if __name__ == '__main__':\n"
+            "    track = InterpolatedTrackKDTree(*GENERATORS[%r](%d))\n"
+            "    seconds = []\n"
+            "    for i in range(%d + 1):\n"
+            "        start = time.perf_counter()\n"
+            "        %s\n"
+            "        seconds.append(time.perf_counter() - start)\n"
+            "    print(json.dumps(statistics.median(seconds[1:])))\n"
+            % (os.path.abspath(DP_DIRECTORY), HERE, generator, numStations, repeat, run))
+    process = subprocess.run([sys.executable, "-c", code], cwd=DP_DIRECTORY,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        for line in process.stderr.strip().splitlines()[-5:]:
+            print("  | " + line)
+        return None
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def runSuite(profile = "quick", maxEdges = 2*10**7, objectGraphEdges = 2*10**5,
+             dpMaxStations = 1000, dpMaxTime = 5, verbose = True):
+    """
+    Returns the list of benchmark records of a profile of PROFILES, each a
+    dictionary with the benchmark name, the generator, the number of
+    stations and lanes and the median seconds over the repeats, each run
+    after a warm-up call.
+
+    For every generated track this times interpolate, createGraph,
+    createCompactGraph, the TrackNodeKDTree, optimumPath half a lap ahead
+    with the "stations" method and with Dijkstra on the "heapq" queue and
+    10000 batched KD queries; per generator and size,
+    SpeedProfileFinder.energy on the middle lane and the vectorized 2019-20
+    DP for dpMaxTime steps, serially and with one worker
+    process per CPU (the "lanes" of the dp2019Parallel records are the
+    number of workers). Tracks of more than maxEdges edges are skipped, as
+    are createGraph above objectGraphEdges and the DP above dpMaxStations.
+    The energy sanity tests run first.
+
+    Parameter profile: the name of the profile
+    Precondition: profile is a key of PROFILES
+    """
+    SpeedProfileFinder.energySanityTest()
+    SpeedProfileFinder.energyGradientSanityTest()
+    SpeedProfileFinder.energyBatchSanityTest()
+    settings = PROFILES[profile]
+    repeat = settings["repeat"]
+    rng = np.random.default_rng(0)
+    results = []
+
+    def record(name, generator, numStations, numArrs, seconds):
+        results.append({"benchmark": name, "generator": generator,
+                        "stations": numStations, "lanes": numArrs, "seconds": seconds})
+        if verbose:
+            print("  %-20s %-15s %7d stations %3s lanes %10.6f s" %
+                  (name, generator, numStations, "-" if numArrs is None else numArrs, seconds))
+
+    for generator in settings["generators"]:
+        for numStations in settings["stations"]:
+            inside, out = GENERATORS[generator](numStations)
+            for numArrs in settings["lanes"]:
+                numEdges = numStations*numArrs**2
+                if numEdges > maxEdges:
+                    continue
+                seconds, arrayList = _timed(lambda: interpolate(inside, out, numArrs), repeat)
+                record("interpolate", generator, numStations, numArrs, seconds)
+                if numEdges <= objectGraphEdges:
+                    seconds, _ = _timed(lambda: createGraph(arrayList), repeat)
+                    record("createGraph", generator, numStations, numArrs, seconds)
+                seconds, graph = _timed(lambda: createCompactGraph(arrayList), repeat)
+                record("createCompactGraph", generator, numStations, numArrs, seconds)
+                seconds, kdTree = _timed(lambda: TrackNodeKDTree(graph), repeat)
+                record("kdTree", generator, numStations, numArrs, seconds)
+
+                middle = arrayList[numArrs//2]
+                first = middle[0][:2]; halfway = middle[numStations//2][:2]
+                for method, queue in (("stations", None), ("dijkstra", "heapq")):
+                    seconds, _ = _timed(lambda: optimumPath(kdTree, first, halfway, method, queue),
+                                        repeat)
+                    record("optimumPath." + (queue or method), generator, numStations,
+                           numArrs, seconds)
+                low = graph.coordinates[:, :2].min(axis=0)
+                high = graph.coordinates[:, :2].max(axis=0)
+                points = rng.uniform(low, high, (10000, 2))
+                seconds, _ = _timed(lambda: kdTree.getClosestNodeIndices(points), repeat)
+                record("kdQueries", generator, numStations, numArrs, seconds)
+
+            # a closed lap of the middle lane, at rest at the start line
+            lap = np.asarray(interpolate(inside, out)[2], dtype=float)
+            lap = np.vstack((lap, lap[:1]))
+            X, Y, Z = lap[:, 0], lap[:, 1], lap[:, 2]
+            SP = rng.uniform(1, 10, len(lap) - 2)
+            seconds, _ = _timed(lambda: SpeedProfileFinder.energy(X, Y, Z, SP, 96, 9.8,
+                                                                  0.03675, 0.01), repeat)
+            record("speedProfileEnergy", generator, numStations, None, seconds)
+            if numStations <= dpMaxStations:
+                seconds = _dpSeconds(generator, numStations, dpMaxTime, repeat)
+                if seconds is None:
+                    if verbose:
+                        print("  dp2019 could not run (are the 2019-20 dependencies installed?)")
+                    continue
+                record("dp2019", generator, numStations, None, seconds)
+                numWorkers = os.cpu_count()
+                parallel = _dpSeconds(generator, numStations, dpMaxTime, repeat, numWorkers)
+                if parallel is not None:
+                    record("dp2019Parallel", generator, numStations, numWorkers, parallel)
+                    if verbose:
+                        print("  %-20s %.2fx the serial DP with %d workers" %
+                              ("", seconds/parallel, numWorkers))
+    return results
+
+
+def writeResults(results, filename):
+    """
+    Writes the benchmark records to filename as JSON, with the versions of
+    Python and NumPy and the platform and number of CPUs they were measured
+    on.
+    """
+    document = {"version": RESULTS_VERSION, "python": platform.python_version(),
+                "numpy": np.__version__, "platform": platform.platform(),
+                "cpus": os.cpu_count(), "results": results}
+    with open(filename, "w") as file:
+        json.dump(document, file, indent=1)
+
+
+def readResults(filename):
+    """
+    Returns the benchmark records written to filename by writeResults.
+    """
+    with open(filename) as file:
+        return json.load(file)["results"]
+
+
+def _key(record):
+    """
+    Helper function returning the (benchmark, generator, stations, lanes)
+    that identifies a benchmark record
+    """
+    return (record["benchmark"], record["generator"], record["stations"], record["lanes"])
+
+
+def unmeasured(results, baseline):
+    """
+    Returns the list of the records of baseline that have no record in
+    results, e.g. because the 2019-20 DP could not run or the profile differs.
+
+    Parameter results, baseline: benchmark records, e.g. of runSuite and
+    readResults
+    """
+    measured = {_key(record) for record in results}
+    return [record for record in baseline if _key(record) not in measured]
+
+
+def compareBaseline(results, baseline, tolerance = 1.5, floor = 1e-2):
+    """
+    Returns the list of regressions of results against baseline: the
+    records that took more than tolerance times their baseline and more
+    than floor seconds longer, each with its baselineSeconds and ratio.
+    Records missing from either side are ignored; see unmeasured.
+
+    Parameter results, baseline: benchmark records, e.g. of runSuite and
+    readResults
+
+    Optional Parameter tolerance, floor: the relative and absolute slowdown
+    tolerated, so that noise in very short timings is not flagged
+    Precondition: tolerance is a number >= 1 and floor a number >= 0
+    """
+    previous = {_key(record): record["seconds"] for record in baseline}
+    regressions = []
+    for record in results:
+        base = previous.get(_key(record))
+        if base is None:
+            continue
+        if record["seconds"] > tolerance*base and record["seconds"] - base > floor:
+            regression = dict(record)
+            regression["baselineSeconds"] = base
+            regression["ratio"] = record["seconds"]/base
+            regressions.append(regression)
+    return regressions
+
+
+def main(arguments = None):
+    """
+    Runs the suite from the command line, writes the results, compares them
+    with the baseline and returns 1 if there are regressions, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks the track planners on synthetic tracks.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--output", default="benchmarkResults.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--floor", type=float, default=1e-2,
+                        help="seconds of slowdown below which no regression is reported")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store the results as the new baseline")
+    options = parser.parse_args(arguments)
+    results = runSuite(options.profile)
+    writeResults(results, options.output)
+    if options.update_baseline:
+        writeResults(results, options.baseline)
+        return 0
+    if not os.path.exists(options.baseline):
+        print("no baseline at " + options.baseline)
+        return 0
+    baseline = readResults(options.baseline)
+    regressions = compareBaseline(results, baseline, options.tolerance, options.floor)
+    missing = unmeasured(results, baseline)
+    for record in missing:
+        print("NOT MEASURED %-18s %-15s %7d stations %3s lanes" %
+              (record["benchmark"], record["generator"], record["stations"],
+               "-" if record["lanes"] is None else record["lanes"]))
+    for regression in regressions:
+        print("REGRESSION %-20s %-15s %7d stations %3s lanes %.6f s vs %.6f s (%.2fx)" %
+              (regression["benchmark"], regression["generator"], regression["stations"],
+               "-" if regression["lanes"] is None else regression["lanes"],
+               regression["seconds"], regression["baselineSeconds"],
+               regression["ratio"]))
+    print("%d regressions in %d benchmarks, %d baseline records not measured" %
+          (len(regressions), len(results), len(missing)))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import numpy as np
+
+class CompactTrackGraph:
+    """
+    Class representing a track graph with array storage instead of TrackNode
+    and Edge objects.
+
+    The coordinates of all nodes are stored in one (N, 3) array and the
+    directed edges in CSR form: the edges leaving node u are
+    indices[indptr[u]:indptr[u+1]] with weights weights[indptr[u]:indptr[u+1]].
+    Nodes follow the createGraph numbering, i.e. the node corresponding to
+    arrayList[h][k] has index k*numArrs+h.
+    """
+    # coordinates = (N, 3) float array of node coordinates
+    # indptr = (N+1,) int array of offsets into indices and weights
+    # indices = (E,) int array of edge destinations
+    # weights = (E,) float array of edge weights
+    # numArrs = number of lanes per station
+    # arrLen = number of stations
+    # configs = list of the VehicleConfigs of configWeights, or None
+    # configWeights = (C, E) float array of the weights of each edge for
+    #                 each of configs (see TrackGraph.useConfigs), or None
+
+    def __init__(self, coordinates, indptr, indices, weights, numArrs, arrLen):
+        """
+        Initializes a CompactTrackGraph from its arrays.
+
+        Parameter coordinates: the coordinates of the nodes
+        Precondition: coordinates is a (N, 3) array
+
+        Parameter indptr: the CSR offsets of the edges of each node
+        Precondition: indptr is a (N+1,) int array
+
+        Parameter indices: the destination node of each edge
+        Precondition: indices is a (E,) int array
+
+        Parameter weights: the weight of each edge
+        Precondition: weights is a (E,) float array
+
+        Parameter numArrs: the number of lanes per station
+        Precondition: numArrs is an int > 0
+
+        Parameter arrLen: the number of stations
+        Precondition: arrLen is an int and numArrs*arrLen == N
+        """
+        assert coordinates.ndim == 2 and coordinates.shape[1] == 3
+        assert len(indptr) == len(coordinates)+1
+        assert len(indices) == len(weights) == indptr[-1]
+        assert numArrs*arrLen == len(coordinates)
+        self.coordinates = coordinates
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.numArrs = numArrs
+        self.arrLen = arrLen
+        self._reverse = None
+        self._geometry = None
+        self.configs = None
+        self.configWeights = None
+
+    def __len__(self):
+        """
+        Overrides python function "len(CompactTrackGraph)"
+        """
+        return len(self.coordinates)
+
+    def __getitem__(self, index):
+        """
+        Returns a TrackNodeView of the node at index so that the graph can be
+        used like the list of TrackNodes returned by createGraph.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("node index out of range")
+        return TrackNodeView(self, index)
+
+    def __iter__(self):
+        """
+        Overrides python function "iter(CompactTrackGraph)"
+        """
+        for index in range(len(self)):
+            yield TrackNodeView(self, index)
+
+    @property
+    def nbytes(self):
+        """
+        Returns the number of bytes used by the arrays of the graph.
+        """
+        return (self.coordinates.nbytes + self.indptr.nbytes +
+                self.indices.nbytes + self.weights.nbytes)
+
+    def edgeGeometry(self):
+        """
+        Returns a (3, E) array of the length, the horizontal length and the
+        rise of each edge, the terms of its energy that do not depend on the
+        speed or the vehicle (see TrackGraph.weightTensor).
+
+        The geometry is computed once and cached.
+        """
+        if self._geometry is None:
+            sources = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+            delta = self.coordinates[self.indices] - self.coordinates[sources]
+            horizontal = np.sqrt(delta[:, 0]**2 + delta[:, 1]**2)
+            dist = np.sqrt(horizontal**2 + delta[:, 2]**2)
+            self._geometry = np.stack((dist, horizontal, delta[:, 2]))
+        return self._geometry
+
+    def withWeights(self, weights):
+        """
+        Returns a CompactTrackGraph sharing the nodes and edges of this one
+        but with other edge weights, e.g. a row of configWeights.
+
+        Parameter weights: the weight of each edge
+        Precondition: weights is a (E,) float array
+        """
+        graph = CompactTrackGraph(self.coordinates, self.indptr, self.indices,
+                                  weights, self.numArrs, self.arrLen)
+        graph._reverse = self._reverse
+        graph._geometry = self._geometry
+        return graph
+
+    def reverse(self):
+        """
+        Returns (indptr, indices, edgeIds) of the transposed graph, where the
+        edges entering node v are indices[indptr[v]:indptr[v+1]] and edgeIds
+        holds the position of each such edge in the forward arrays.
+
+        The transpose is computed once and cached.
+        """
+        if self._reverse is None:
+            sources = np.repeat(np.arange(len(self), dtype=self.indices.dtype),
+                                np.diff(self.indptr))
+            edgeIds = np.argsort(self.indices, kind='stable')
+            counts = np.bincount(self.indices, minlength=len(self))
+            indptr = np.zeros(len(self)+1, dtype=self.indptr.dtype)
+            np.cumsum(counts, out=indptr[1:])
+            self._reverse = (indptr, sources[edgeIds], edgeIds)
+        return self._reverse
+
+
+class TrackNodeView:
+    """
+    Lightweight TrackNode-like view of a node of a CompactTrackGraph.
+
+    Views are created on demand and compare equal if they refer to the same
+    node of the same graph, so they can be used as dictionary keys by
+    optimumPath and returned by TrackNodeKDTree.
+    """
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    @property
+    def x(self):
+        return float(self.graph.coordinates[self.index, 0])
+
+    @property
+    def y(self):
+        return float(self.graph.coordinates[self.index, 1])
+
+    @property
+    def z(self):
+        return float(self.graph.coordinates[self.index, 2])
+
+    @property
+    def edgesOut(self):
+        """ Returns EdgeViews of the edges from this node """
+        graph = self.graph
+        return [EdgeView(graph, e) for e in
+                range(graph.indptr[self.index], graph.indptr[self.index+1])]
+
+    @property
+    def edgesIn(self):
+        """ Returns EdgeViews of the edges to this node """
+        indptr, _, edgeIds = self.graph.reverse()
+        return [EdgeView(self.graph, int(e)) for e in
+                edgeIds[indptr[self.index]:indptr[self.index+1]]]
+
+    @property
+    def neighborsTo(self):
+        """ Returns views of the nodes to which you can go from here """
+        graph = self.graph
+        targets = graph.indices[graph.indptr[self.index]:graph.indptr[self.index+1]]
+        return [TrackNodeView(graph, int(v)) for v in dict.fromkeys(targets.tolist())]
+
+    @property
+    def neighborsFrom(self):
+        """ Returns views of the nodes from which you can get here """
+        indptr, sources, _ = self.graph.reverse()
+        return [TrackNodeView(self.graph, int(u)) for u in
+                dict.fromkeys(sources[indptr[self.index]:indptr[self.index+1]].tolist())]
+
+    def __eq__(self, ob):
+        """
+        Overrides "==" for TrackNodeViews
+        """
+        return (isinstance(ob, TrackNodeView) and self.graph is ob.graph
+                and self.index == ob.index)
+
+    def __hash__(self):
+        return hash((id(self.graph), self.index))
+
+    def __repr__(self):
+        return "TrackNodeView(" + str(self.index) + ")"
+
+
+class EdgeView:
+    """
+    Lightweight Edge-like view of an edge of a CompactTrackGraph.
+    """
+    __slots__ = ('graph', 'edge')
+
+    def __init__(self, graph, edge):
+        self.graph = graph
+        self.edge = edge
+
+    @property
+    def weight(self):
+        return float(self.graph.weights[self.edge])
+
+    @property
+    def nodeFrom(self):
+        node = np.searchsorted(self.graph.indptr, self.edge, side='right') - 1
+        return TrackNodeView(self.graph, int(node))
+
+    @property
+    def nodeTo(self):
+        return TrackNodeView(self.graph, int(self.graph.indices[self.edge]))
@@ -0,0 +1,200 @@
+import numpy as np
+
+inf = float("inf")
+
+class CostToGoTable:
+    """
+    Class storing the optimal remaining energy to a finish node, and the
+    successor on the optimal path, for every node of a CompactTrackGraph.
+
+    The table is filled by one backward sweep over the stations from the
+    finish, after which re-planning from any node is pointer chasing through
+    the successor array, with no search.
+    """
+    # costToGo = (N,) float array, minimum energy from each node to finish
+    # successor = (N,) int array, next node on that path, -1 at finish or
+    #             if finish cannot be reached
+    # finish = index of the finish node
+
+    def __init__(self, costToGo, successor, finish):
+        """
+        Initializes a CostToGoTable from its arrays; use build or load to
+        create one.
+
+        Parameter costToGo: the minimum energy from each node to finish
+        Precondition: costToGo is a (N,) float array
+
+        Parameter successor: the next node of each node on its optimal path
+        Precondition: successor is a (N,) int array
+
+        Parameter finish: the index of the finish node
+        Precondition: finish is an int in [0, N)
+        """
+        assert costToGo.shape == successor.shape and 0 <= finish < len(costToGo)
+        self.costToGo = costToGo
+        self.successor = successor
+        self.finish = int(finish)
+        self._successorList = None
+
+    @classmethod
+    def build(cls, graph, finish):
+        """
+        Returns the CostToGoTable of graph for the given finish node.
+
+        Sweeps the stations backwards from finish with one numArrs x numArrs
+        min-plus step per station. The lanes of the finish station other than
+        finish itself are reached last, a full lap away.
+        Time: O(stations*numArrs**2), vectorized over the lanes.
+
+        Parameter graph: the graph to build the table for
+        Precondition: graph is a CompactTrackGraph of createCompactGraph layout
+
+        Parameter finish: the index of the finish node
+        Precondition: finish is an int in [0, len(graph))
+        """
+        numArrs = graph.numArrs; arrLen = graph.arrLen
+        W = graph.weights.reshape(arrLen, numArrs, numArrs)
+        finishStation, finishLane = divmod(finish, numArrs)
+        costToGo = np.full((arrLen, numArrs), inf)
+        successor = np.full((arrLen, numArrs), -1, dtype=np.int64)
+        costToGo[finishStation, finishLane] = 0.0
+        # Invariant: costToGo and successor are final for the stations
+        # finishStation-step+1 .. finishStation (finish lane only for step 0).
+        for step in range(1, arrLen + 1):
+            station = (finishStation - step) % arrLen
+            nextStation = (station + 1) % arrLen
+            relaxed = W[station] + costToGo[nextStation][None, :]
+            best = np.argmin(relaxed, axis=1)
+            cost = relaxed[np.arange(numArrs), best]
+            if station == finishStation:
+                cost[finishLane] = 0.0
+            reachable = cost < inf
+            costToGo[station] = cost
+            successor[station] = np.where(reachable, nextStation*numArrs + best, -1)
+            if station == finishStation:
+                successor[station, finishLane] = -1
+        return cls(costToGo.reshape(-1), successor.reshape(-1), finish)
+
+    @classmethod
+    def fromPath(cls, graph, path):
+        """
+        Returns the CostToGoTable of graph that follows a planned path to its
+        last node, e.g. the path of JointPlanner.jointPlan, instead of the
+        optimal path of the graph weights.
+
+        Every node of a station the path leaves from heads for the path's node
+        at the next station, so a car off the plan rejoins it one station
+        later. The energy to go is that of the graph weights along the plan.
+        Nodes of the other stations cannot reach the finish. For a full lap
+        (first and last node equal), the other lanes of the finish station go
+        round the lap, as in build.
+        Time: O(len(path)*numArrs).
+
+        Parameter graph: the graph of the path
+        Precondition: graph is a CompactTrackGraph of createCompactGraph layout
+
+        Parameter path: the node indices of the planned path
+        Precondition: path is a sequence of at least 2 ints in [0, len(graph)),
+        each on the station after the previous one
+        """
+        assert len(path) > 1
+        numArrs = graph.numArrs
+        W = graph.weights.reshape(graph.arrLen, numArrs, numArrs)
+        finish = int(path[-1])
+        costToGo = np.full(len(graph), inf)
+        successor = np.full(len(graph), -1, dtype=np.int64)
+        costToGo[finish] = 0.0
+        # Invariant: the nodes of the stations of path[i+1:] head for the
+        # path, and costToGo and successor of path[i+1] are final.
+        for i in range(len(path) - 2, -1, -1):
+            station = int(path[i])//numArrs
+            nextNode = int(path[i + 1])
+            nodes = station*numArrs + np.arange(numArrs)
+            cost = W[station][:, nextNode % numArrs] + costToGo[nextNode]
+            update = (nodes != finish) & (cost < inf)
+            costToGo[nodes[update]] = cost[update]
+            successor[nodes[update]] = nextNode
+        return cls(costToGo, successor, finish)
+
+    def energy(self, node):
+        """
+        Returns the minimum energy from node to the finish.
+
+        Parameter node: the index of the node
+        Precondition: node is an int in [0, N)
+        """
+        return float(self.costToGo[node])
+
+    def path(self, node):
+        """
+        Returns the list of node indices of the optimal path from node to the
+        finish, or None if the finish cannot be reached.
+
+        Parameter node: the index of the first node
+        Precondition: node is an int in [0, N)
+        """
+        if self.costToGo[node] == inf:
+            return None
+        if self._successorList is None:
+            self._successorList = self.successor.tolist()
+        successor = self._successorList
+        path = [int(node)]
+        while path[-1] != self.finish:
+            path.append(int(successor[path[-1]]))
+        return path
+
+    def nextNode(self, graphKDTree, current_position):
+        """
+        Returns the index of the node to head for from the node closest to
+        current_position, or -1 if it is the finish or cannot reach it.
+        Time: one KDTree query.
+
+        Parameter graphKDTree: the KDTree of the graph of the table
+        Precondition: graphKDTree is a TrackNodeKDTree of a CompactTrackGraph
+
+        Parameter current_position: the position of the vehicle
+        Precondition: current_position is a list of length 2
+        """
+        start = graphKDTree.getClosestNode(current_position).index
+        return int(self.successor[start])
+
+    def replan(self, graphKDTree, current_position):
+        """
+        Returns (path, energy) from the node closest to current_position to the
+        finish, like optimumPath(graphKDTree, current_position, finish), but
+        using the table instead of a search.
+
+        Parameter graphKDTree: the KDTree of the graph of the table
+        Precondition: graphKDTree is a TrackNodeKDTree of a CompactTrackGraph
+
+        Parameter current_position: the position of the vehicle
+        Precondition: current_position is a list of length 2
+        """
+        graph = graphKDTree.graph
+        start = graphKDTree.getClosestNode(current_position).index
+        path = self.path(start)
+        if path is None:
+            return None
+        return [graph[index] for index in path], self.energy(start)
+
+    def save(self, filename):
+        """
+        Saves the table to filename as a .npz file, e.g. next to the track
+        data it was built for.
+
+        Parameter filename: the file to save to
+        Precondition: filename is a string or path
+        """
+        np.savez(filename, costToGo=self.costToGo, successor=self.successor,
+                 finish=np.array(self.finish))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Returns the CostToGoTable saved in filename by save.
+
+        Parameter filename: the file to load from
+        Precondition: filename is a string or path of a .npz file
+        """
+        with np.load(filename) as data:
+            return cls(data['costToGo'], data['successor'], int(data['finish']))
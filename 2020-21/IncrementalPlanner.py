@@ -0,0 +1,192 @@
+import heapq
+import itertools
+
+inf = float("inf")
+
+class IncrementalPlanner:
+    """
+    Class to keep the minimum energy path from a (moving) start node to a goal
+    node of a CompactTrackGraph up to date while edge weights change.
+
+    This is D* Lite without a heuristic: an LPA* search backwards from the
+    goal, so g[u] is the minimum energy from u to the goal. After a batch of
+    edge weights changes only the nodes whose g values are affected are
+    expanded again, instead of searching the whole graph from scratch. The
+    heuristic is left out on purpose because the weight updates (battery
+    mass, wind, target speed) can invalidate any fixed physics lower bound.
+    """
+    # _graph = the CompactTrackGraph searched, whose weights are updated in place
+    # _weights = python list copy of the weights for fast access
+    # _g = minimum energy to goal found so far for every node
+    # _rhs = one step lookahead of _g: min over edges (u, s) of w + _g[s]
+    # _heap = heapq list of (key, counter, node) entries, stale entries skipped
+    # _queued = mapping of nodes in the queue to their current key
+    # numExpanded = total number of nodes expanded
+
+    def __init__(self, graph, start, goal):
+        """
+        Initializes a planner for paths from start to goal and computes the
+        first shortest path.
+
+        Parameter graph: the graph to plan on
+        Precondition: graph is a CompactTrackGraph with non negative weights
+
+        Parameter start, goal: the indices of the first and last node
+        Precondition: start and goal are ints in [0, len(graph))
+        """
+        numNodes = len(graph)
+        self._graph = graph
+        self._indptr = graph.indptr.tolist()
+        self._indices = graph.indices.tolist()
+        self._weights = graph.weights.tolist()
+        reverseIndptr, sources, edgeIds = graph.reverse()
+        self._reverseIndptr = reverseIndptr.tolist()
+        self._sources = sources.tolist()
+        self._start = start
+        self._goal = goal
+        self._g = [inf]*numNodes
+        self._rhs = [inf]*numNodes
+        self._rhs[goal] = 0.0
+        self._heap = []
+        self._queued = {}
+        self._counter = itertools.count()
+        self.numExpanded = 0
+        self._push(goal, 0.0)
+        self.computeShortestPath()
+
+    @property
+    def start(self):
+        return self._start
+
+    @property
+    def goal(self):
+        return self._goal
+
+    def energy(self, node = None):
+        """
+        Returns the minimum energy from node (by default the start) to goal as
+        of the last computeShortestPath.
+        """
+        return self._g[self._start if node is None else node]
+
+    def _push(self, node, key):
+        """
+        Helper method to add node to the queue or change its key
+        """
+        self._queued[node] = key
+        heapq.heappush(self._heap, (key, next(self._counter), node))
+
+    def _topKey(self):
+        """
+        Helper method returning the smallest key in the queue, dropping stale
+        entries
+        """
+        heap = self._heap; queued = self._queued
+        while heap:
+            key, _, node = heap[0]
+            if queued.get(node) == key:
+                return key
+            heapq.heappop(heap)
+        return inf
+
+    def _updateVertex(self, u):
+        """
+        Helper method to recompute rhs[u] from the successors of u and fix the
+        membership of u in the queue
+        """
+        g = self._g; rhs = self._rhs
+        if u != self._goal:
+            best = inf
+            weights = self._weights; indices = self._indices
+            for e in range(self._indptr[u], self._indptr[u+1]):
+                cost = weights[e] + g[indices[e]]
+                if cost < best:
+                    best = cost
+            rhs[u] = best
+        if g[u] != rhs[u]:
+            self._push(u, min(g[u], rhs[u]))
+        else:
+            self._queued.pop(u, None)
+
+    def computeShortestPath(self):
+        """
+        Expands nodes until the energy of the start node is final and returns
+        the number of nodes expanded by this call.
+        """
+        g = self._g; rhs = self._rhs; start = self._start
+        sources = self._sources; reverseIndptr = self._reverseIndptr
+        expanded = 0
+        # Invariant: every node with g != rhs is in the queue with key
+        # min(g, rhs), and every node with a key below the top key has its
+        # final g value.
+        while self._topKey() < min(g[start], rhs[start]) or rhs[start] != g[start]:
+            if not self._heap:
+                break
+            _, _, u = heapq.heappop(self._heap)
+            del self._queued[u]
+            expanded += 1
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+            else:
+                g[u] = inf
+                self._updateVertex(u)
+            for i in range(reverseIndptr[u], reverseIndptr[u+1]):
+                self._updateVertex(sources[i])
+        self.numExpanded += expanded
+        return expanded
+
+    def updateEdgeWeights(self, edgeIds, newWeights):
+        """
+        Changes the weights of a batch of edges, both in the planner and in
+        the graph, and repairs the shortest path. Returns the number of nodes
+        that had to be expanded again.
+
+        Parameter edgeIds: the positions of the edges in the graph's CSR arrays
+        Precondition: edgeIds is a sequence of ints in [0, len(graph.weights))
+
+        Parameter newWeights: the new weight of each edge
+        Precondition: newWeights is a sequence of non negative floats of the
+        same length as edgeIds
+        """
+        assert len(edgeIds) == len(newWeights)
+        indptr = self._graph.indptr
+        changed = set()
+        for e, weight in zip(edgeIds, newWeights):
+            e = int(e); weight = float(weight)
+            self._weights[e] = weight
+            self._graph.weights[e] = weight
+            changed.add(int(indptr.searchsorted(e, side='right')) - 1)
+        for u in changed:
+            self._updateVertex(u)
+        return self.computeShortestPath()
+
+    def moveTo(self, start):
+        """
+        Moves the start node, e.g. after the vehicle has advanced, and returns
+        the number of nodes expanded to find its shortest path.
+
+        Parameter start: the index of the new start node
+        Precondition: start is an int in [0, len(graph))
+        """
+        self._start = start
+        return self.computeShortestPath()
+
+    def path(self):
+        """
+        Returns the list of node indices of the minimum energy path from start
+        to goal, or None if goal cannot be reached.
+        """
+        g = self._g
+        if g[self._start] == inf:
+            return None
+        weights = self._weights; indices = self._indices; indptr = self._indptr
+        path = [self._start]
+        while path[-1] != self._goal:
+            u = path[-1]
+            best = inf; bestNode = -1
+            for e in range(indptr[u], indptr[u+1]):
+                cost = weights[e] + g[indices[e]]
+                if cost < best:
+                    best = cost; bestNode = indices[e]
+            path.append(bestNode)
+        return path
@@ -0,0 +1,156 @@
+import numpy as np
+
+inf = float("inf")
+
+def jointSweep(graph, start, end, speeds, m = 96, g = 9.8, ca = 0.03675, cr = 0.01,
+               timeWeight = 0, startSpeed = 0, endSpeed = None):
+    """
+    Returns (path, speedProfile, energy, time) for the path from node start
+    to node end of a CompactTrackGraph created by createCompactGraph, and the
+    speed at each of its nodes, that minimize energy + timeWeight*time, or
+    None if end cannot be reached.
+
+    The states are (node, speed index) pairs. Going from lane a at speed v to
+    lane b of the next station at speed w costs the energy of
+    SpeedProfileFinder.energy over the edge: F*D clamped at 0 with
+    F = m*(w**2-v**2)/(2*D) + m*g*sinVA + ca*avgV**2 + cr*m*g*cosVA, and
+    takes D/avgV seconds. Like stationSweep, the stations are swept from
+    start to end, relaxing all (numArrs*numSpeeds)**2 transitions of a
+    station in one NumPy min-plus step.
+    Time: O(stations*(numArrs*numSpeeds)**2), vectorized over the states.
+
+    Parameter graph: the graph to search
+    Precondition: graph is a CompactTrackGraph of createCompactGraph layout
+
+    Parameter start, end: the indices of the first and last node of the path
+    Precondition: start and end are ints in [0, len(graph)) on different
+    stations, or equal for a full lap
+
+    Parameter speeds: the possible speeds at the nodes
+    Precondition: speeds is a sorted 1-D float array of numbers >= 0
+
+    Optional Parameter m, g, ca, cr: the vehicle, as in SpeedProfileFinder.energy
+
+    Optional Parameter timeWeight: the energy a second is worth
+    Precondition: timeWeight is a number >= 0
+
+    Optional Parameter startSpeed: the index in speeds of the speed at start
+    Precondition: startSpeed is an int in [0, len(speeds))
+
+    Optional Parameter endSpeed: the index in speeds of the speed at end, by
+    default free; SpeedProfileFinder.energy instead fixes the speed at 0 at
+    both ends, which endSpeed = 0 with speeds[0] = 0 reproduces
+    Precondition: endSpeed is None or an int in [0, len(speeds))
+    """
+    speeds = np.asarray(speeds, dtype=float)
+    numArrs = graph.numArrs; arrLen = graph.arrLen; numSpeeds = len(speeds)
+    numStates = numArrs*numSpeeds
+    dist, horizontal, rise = graph.edgeGeometry()
+    D = dist.reshape(arrLen, numArrs, numArrs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(D > 0, (m*g*rise + cr*m*g*horizontal).reshape(D.shape)/D, 0)
+    avgV = (speeds[:, None] + speeds[None, :])/2 # (v, w)
+    moving = avgV > 0
+    # a car at rest at both ends never gets to the next station
+    kinetic = np.where(moving, m*(speeds[None, :]**2 - speeds[:, None]**2)/2, inf)
+    drag = ca*avgV**2
+    inverseAvgV = np.where(moving, 1/np.where(moving, avgV, 1), 0)
+    kinetic4 = kinetic[None, :, None, :]; drag4 = drag[None, :, None, :]
+    timeFactor4 = timeWeight*inverseAvgV[None, :, None, :]
+
+    startStation, startLane = divmod(start, numArrs)
+    endStation, endLane = divmod(end, numArrs)
+    numSteps = (endStation - startStation) % arrLen
+    if numSteps == 0:
+        numSteps = arrLen
+    # state index = lane*numSpeeds + speed index
+    cost = np.full(numStates, inf); energy = np.zeros(numStates); time = np.zeros(numStates)
+    cost[startLane*numSpeeds + startSpeed] = 0.0
+    states = np.arange(numStates)
+    lane, speed = np.divmod(states, numSpeeds)
+    bckptr = np.empty((numSteps, numStates), dtype=np.int32)
+    stepCost = np.empty((numArrs, numSpeeds, numArrs, numSpeeds))
+    # Invariant: cost[b*numSpeeds+w] is the minimum of energy +
+    # timeWeight*time from start to lane b of station startStation+step at
+    # speed w, energy and time are those of that path, and bckptr[0..step-1]
+    # hold the previous state of each state on it.
+    for step in range(numSteps):
+        station = (startStation + step) % arrLen
+        d = D[station][:, None, :, None] # (a, 1, b, 1)
+        np.add(slope[station][:, None, :, None], drag4, out=stepCost)
+        np.multiply(stepCost, d, out=stepCost)
+        np.add(stepCost, kinetic4, out=stepCost)
+        np.maximum(stepCost, 0, out=stepCost)
+        if timeWeight:
+            stepCost += d*timeFactor4
+        relaxed = cost[:, None] + stepCost.reshape(numStates, numStates)
+        previous = np.argmin(relaxed, axis=0)
+        bckptr[step] = previous
+        cost = relaxed[previous, states]
+        previousLane, previousSpeed = np.divmod(previous, numSpeeds)
+        d = D[station][previousLane, lane]
+        energy = energy[previous] + np.maximum(kinetic[previousSpeed, speed] +
+            d*(slope[station][previousLane, lane] + drag[previousSpeed, speed]), 0)
+        time = time[previous] + d*inverseAvgV[previousSpeed, speed]
+
+    if endSpeed is None:
+        endStates = endLane*numSpeeds + np.arange(numSpeeds)
+    else:
+        endStates = np.array([endLane*numSpeeds + endSpeed])
+    best = endStates[np.argmin(cost[endStates])]
+    if cost[best] == inf:
+        return None
+    path = []; speedProfile = []; state = int(best)
+    for step in range(numSteps, -1, -1):
+        lane, speed = divmod(state, numSpeeds)
+        path.append(((startStation + step) % arrLen)*numArrs + lane)
+        speedProfile.append(float(speeds[speed]))
+        if step > 0:
+            state = int(bckptr[step - 1, state])
+    path.reverse(); speedProfile.reverse()
+    return path, speedProfile, float(energy[best]), float(time[best])
+
+
+def jointPlan(graph, start, end, speeds, maxTime = None, m = 96, g = 9.8, ca = 0.03675,
+              cr = 0.01, startSpeed = 0, endSpeed = None, tolerance = 1e-2,
+              maxIterations = 40):
+    """
+    Returns (path, speedProfile, energy, time) of jointSweep for the minimum
+    energy path and speeds from start to end taking at most maxTime
+    seconds, or None if no path takes at most maxTime.
+
+    The time limit is handled by Lagrangian relaxation: jointSweep minimizes
+    energy + timeWeight*time, and timeWeight is found as the smallest weight
+    whose solution meets maxTime, to a relative tolerance: it is bracketed by
+    doubling from 1, then bisected.
+    As the speeds are discrete the result can be slightly faster than
+    maxTime and is optimal for the time it takes.
+
+    Optional Parameter maxTime: the time limit, by default none
+    Precondition: maxTime is None or a number > 0
+
+    See jointSweep for the other parameters.
+    """
+    solve = lambda timeWeight: jointSweep(graph, start, end, speeds, m, g, ca, cr,
+                                          timeWeight, startSpeed, endSpeed)
+    result = solve(0)
+    if result is None or maxTime is None or result[3] <= maxTime:
+        return result
+    # find a weight fast enough, then bisect between it and a too slow one
+    low = 0.0; high = 1.0
+    result = solve(high)
+    while result[3] > maxTime:
+        if high > 1e12:
+            return None
+        low = high; high *= 2
+        result = solve(high)
+    for i in range(maxIterations):
+        if high - low <= tolerance*high:
+            break
+        middle = (low + high)/2
+        candidate = solve(middle)
+        if candidate[3] <= maxTime:
+            high = middle; result = candidate
+        else:
+            low = middle
+    return result
@@ -0,0 +1,149 @@
+import json
+import pickle
+import struct
+import numpy as np
+from sklearn.neighbors import KDTree
+from CompactTrackGraph import CompactTrackGraph
+from CostToGoTable import CostToGoTable
+from TrackNodeKDTree import TrackNodeKDTree
+from TrackGraph import interpolate, createCompactGraph
+
+# File layout: MAGIC, the format version and the length of the header as two
+# little endian uint32, the JSON header (the table of contents), then every
+# array at an ALIGNMENT byte offset, so that each can be mapped in place.
+MAGIC = b"TRKBNDL\0"
+BUNDLE_VERSION = 1
+ALIGNMENT = 64
+
+def _aligned(offset):
+    """
+    Helper function returning offset rounded up to a multiple of ALIGNMENT
+    """
+    return -(-offset//ALIGNMENT)*ALIGNMENT
+
+
+def saveBundle(filename, graphKDTree, table = None):
+    """
+    Saves the CompactTrackGraph of graphKDTree, the state of the KDTree and
+    optionally a CostToGoTable to filename as one planning bundle, to be
+    opened by loadBundle.
+
+    Parameter filename: the file to save to
+    Precondition: filename is a string or path
+
+    Parameter graphKDTree: the KDTree of the graph
+    Precondition: graphKDTree is a TrackNodeKDTree of a CompactTrackGraph
+
+    Optional Parameter table: the cost-to-go table of the graph
+    Precondition: table is None or a CostToGoTable of the graph
+    """
+    graph = graphKDTree.graph
+    assert isinstance(graph, CompactTrackGraph)
+    arrays = {"coordinates": graph.coordinates, "indptr": graph.indptr,
+              "indices": graph.indices, "weights": graph.weights}
+    # the arrays of the KDTree state are mapped, the rest (sizes, the
+    # distance metric) is small and pickled
+    kdState = KDTree.__getstate__(graphKDTree)
+    kdArrays = [i for i, item in enumerate(kdState) if isinstance(item, np.ndarray)]
+    for i in kdArrays:
+        arrays["kd%d" % i] = kdState[i]
+    kdObjects = [None if i in kdArrays else item for i, item in enumerate(kdState)]
+    arrays["kdObjects"] = np.frombuffer(pickle.dumps(kdObjects), dtype=np.uint8)
+    header = {"numArrs": graph.numArrs, "arrLen": graph.arrLen,
+              "kdArrays": kdArrays, "finish": None, "arrays": {}}
+    if table is not None:
+        arrays["costToGo"] = table.costToGo
+        arrays["successor"] = table.successor
+        header["finish"] = table.finish
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    # offsets depend on the header length, which depends on the offsets, so
+    # the header is given room for offsets of any size first
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": np.lib.format.dtype_to_descr(array.dtype),
+                                  "shape": list(array.shape), "offset": 2**63}
+    start = _aligned(len(MAGIC) + 8 + len(json.dumps(header).encode()))
+    offset = start
+    for name, array in arrays.items():
+        header["arrays"][name]["offset"] = offset
+        offset = _aligned(offset + array.nbytes)
+    encoded = json.dumps(header).encode()
+    with open(filename, "wb") as file:
+        file.write(MAGIC + struct.pack("<II", BUNDLE_VERSION, len(encoded)) + encoded)
+        for name, array in arrays.items():
+            file.write(b"\0"*(header["arrays"][name]["offset"] - file.tell()))
+            file.write(array.tobytes())
+
+
+def loadBundle(filename):
+    """
+    Returns (graphKDTree, table) from a planning bundle saved by saveBundle,
+    where table is None if the bundle has no CostToGoTable.
+
+    The file is memory-mapped read only and every array of the graph, the
+    KDTree and the table is a view of the mapping, so nothing is parsed,
+    copied or rebuilt: the pages are read from disk as queries touch them.
+    The arrays are read only, so copy graph.weights before handing the graph
+    to an IncrementalPlanner that updates edges.
+    Only open bundles from trusted sources, as part of the KDTree state is
+    pickled.
+
+    Parameter filename: the file to load from
+    Precondition: filename is a planning bundle
+    """
+    mapping = np.memmap(filename, dtype=np.uint8, mode="r")
+    if bytes(mapping[:len(MAGIC)]) != MAGIC:
+        raise ValueError(str(filename) + " is not a planning bundle")
+    version, length = struct.unpack("<II", bytes(mapping[len(MAGIC):len(MAGIC)+8]))
+    if version != BUNDLE_VERSION:
+        raise ValueError("unsupported planning bundle version " + str(version))
+    header = json.loads(bytes(mapping[len(MAGIC)+8:len(MAGIC)+8+length]))
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.lib.format.descr_to_dtype(_descr(entry["dtype"]))
+        shape = tuple(entry["shape"])
+        arrays[name] = np.ndarray(shape, dtype, buffer=mapping, offset=entry["offset"])
+
+    graph = CompactTrackGraph(arrays["coordinates"], arrays["indptr"], arrays["indices"],
+                              arrays["weights"], header["numArrs"], header["arrLen"])
+    kdState = pickle.loads(arrays["kdObjects"].tobytes())
+    for i in header["kdArrays"]:
+        kdState[i] = arrays["kd%d" % i]
+    graphKDTree = TrackNodeKDTree.__new__(TrackNodeKDTree)
+    KDTree.__setstate__(graphKDTree, tuple(kdState))
+    graphKDTree._data = graph
+    graphKDTree._coordinates = graph.coordinates[:, :2]
+    table = None
+    if header["finish"] is not None:
+        table = CostToGoTable(arrays["costToGo"], arrays["successor"], header["finish"])
+    return graphKDTree, table
+
+
+def _descr(descr):
+    """
+    Helper function turning the lists of a structured dtype description
+    read from JSON back into the tuples numpy expects
+    """
+    if isinstance(descr, list):
+        # fields are [name, descr] or [name, descr, shape]
+        return [(field[0], _descr(field[1])) + tuple(tuple(shape) for shape in field[2:])
+                for field in descr]
+    return descr
+
+
+def buildBundle(filename, innerData, outerData, finish = None):
+    """
+    Builds the graph of the track between innerData and outerData, its
+    KDTree and, if finish is given, the CostToGoTable to finish, and saves
+    them to filename as a planning bundle. Returns (graphKDTree, table).
+
+    Parameter innerData, outerData: the borders of the track, see interpolate
+
+    Optional Parameter finish: the index of the finish node
+    Precondition: finish is None or an int in [0, number of nodes)
+    """
+    graph = createCompactGraph(interpolate(innerData, outerData))
+    graphKDTree = TrackNodeKDTree(graph)
+    table = None if finish is None else CostToGoTable.build(graph, finish)
+    saveBundle(filename, graphKDTree, table)
+    return graphKDTree, table
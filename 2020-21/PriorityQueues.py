@@ -0,0 +1,259 @@
+import heapq
+import itertools
+
+class LazyHeapQueue:
+    """
+    Min or max priority queue on top of heapq with lazy deletion.
+
+    It has the same interface as TrackNodeHeap. updatePriority pushes a new
+    entry instead of moving the old one, and stale entries are skipped when
+    they reach the top of the heap.
+    """
+    # _sign = 1 for a min queue and -1 for a max queue
+    # _heap = heapq list of [sign*priority, counter, node] entries
+    # _priority = mapping of the nodes in the queue to their current priority
+    # _counter = tie breaker so that nodes themselves are never compared
+
+    def __init__(self, isMax = False):
+        """
+        Initializes an empty max-queue if isMax is true.
+        Initializes an empty min-queue if isMax is false.
+
+        Parameter isMax: whether the queue is a max queue or min queue
+        Precondition: isMax is a bool
+        """
+        assert type(isMax) == bool
+        self._sign = -1 if isMax else 1
+        self._heap = []
+        self._priority = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        """
+        Overrides python function "len(LazyHeapQueue)"
+        """
+        return len(self._priority)
+
+    def __contains__(self, node):
+        """
+        Overrides python operator "node in LazyHeapQueue"
+        """
+        return node in self._priority
+
+    def add(self, node, priority):
+        """
+        Add a node with the respective priority to the queue.
+        Time: O(log(entries))
+
+        Parameter node: the element to be added in the queue
+        Precondition: node is hashable and not in the queue
+
+        Parameter priority: the priority of node
+        Precondition: priority is a float
+        """
+        if node in self._priority:
+            raise Exception("node is already in the heap")
+        self._priority[node] = priority
+        heapq.heappush(self._heap, (self._sign*priority, next(self._counter), node))
+
+    def updatePriority(self, node, priority):
+        """
+        Change the priority of a node in the queue.
+        Time: O(log(entries))
+
+        Parameter node: the element whose priority needs updating
+        Precondition: node is in the queue
+
+        Parameter priority: the new priority of node
+        Precondition: priority is a float
+        """
+        if node not in self._priority:
+            raise Exception("node is not in the heap")
+        self._priority[node] = priority
+        heapq.heappush(self._heap, (self._sign*priority, next(self._counter), node))
+
+    def _prune(self):
+        """
+        Helper method to drop stale entries from the top of the heap
+        """
+        heap = self._heap; current = self._priority; sign = self._sign
+        while heap:
+            key, _, node = heap[0]
+            if node in current and sign*current[node] == key:
+                return
+            heapq.heappop(heap)
+
+    def peek(self):
+        """
+        Return the node with lowest priority if min queue or highest if max.
+
+        If queue is empty, raises exception.
+        """
+        self._prune()
+        if not self._heap:
+            raise Exception("heap is empty")
+        return self._heap[0][2]
+
+    def poll(self):
+        """
+        Return and remove the node with lowest priority if min queue or highest
+        if max.
+        Amortized time: O(log(entries))
+
+        If queue is empty, raises exception.
+        """
+        self._prune()
+        if not self._heap:
+            raise Exception("heap is empty")
+        node = heapq.heappop(self._heap)[2]
+        del self._priority[node]
+        return node
+
+
+class IndexedDaryHeap:
+    """
+    Min priority queue of integer node ids in [0, capacity) stored as a d-ary
+    heap in flat lists, with a position index for O(log_d(size))
+    updatePriority.
+
+    It has the same interface as TrackNodeHeap but only accepts ints.
+    """
+    # _d = number of children of every heap entry
+    # _heap = node ids in heap order
+    # _prio = priority of every node id, indexed by id
+    # _pos = position of every node id in _heap or -1 if not in the heap
+
+    def __init__(self, capacity, d = 4):
+        """
+        Initializes an empty heap for node ids 0..capacity-1.
+
+        Parameter capacity: the number of possible node ids
+        Precondition: capacity is an int >= 0
+
+        Optional Parameter d: the arity of the heap
+        Precondition: d is an int >= 2
+        """
+        assert capacity >= 0 and d >= 2
+        self._d = d
+        self._heap = []
+        self._prio = [0.0]*capacity
+        self._pos = [-1]*capacity
+
+    def __len__(self):
+        """
+        Overrides python function "len(IndexedDaryHeap)"
+        """
+        return len(self._heap)
+
+    def __contains__(self, node):
+        """
+        Overrides python operator "node in IndexedDaryHeap"
+        """
+        return self._pos[node] >= 0
+
+    def add(self, node, priority):
+        """
+        Add a node id with the respective priority to the heap.
+        Time: O(log_d(size))
+
+        Parameter node: the id to be added in the heap
+        Precondition: node is an int in [0, capacity) and not in the heap
+
+        Parameter priority: the priority of node
+        Precondition: priority is a float
+        """
+        if self._pos[node] >= 0:
+            raise Exception("node is already in the heap")
+        self._prio[node] = priority
+        self._heap.append(node)
+        self._siftUp(len(self._heap) - 1)
+
+    def updatePriority(self, node, priority):
+        """
+        Change the priority of a node id in the heap.
+        Time: O(log_d(size)) for a decrease, O(d*log_d(size)) for an increase
+
+        Parameter node: the id whose priority needs updating
+        Precondition: node is in the heap
+
+        Parameter priority: the new priority of node
+        Precondition: priority is a float
+        """
+        h = self._pos[node]
+        if h < 0:
+            raise Exception("node is not in the heap")
+        oldPriority = self._prio[node]
+        self._prio[node] = priority
+        if priority < oldPriority:
+            self._siftUp(h)
+        elif priority > oldPriority:
+            self._siftDown(h)
+
+    def peek(self):
+        """
+        Return the node id with lowest priority.
+
+        If heap is empty, raises exception.
+        """
+        if not self._heap:
+            raise Exception("heap is empty")
+        return self._heap[0]
+
+    def poll(self):
+        """
+        Return and remove the node id with lowest priority.
+        Time: O(d*log_d(size))
+
+        If heap is empty, raises exception.
+        """
+        heap = self._heap
+        if not heap:
+            raise Exception("heap is empty")
+        node = heap[0]
+        last = heap.pop()
+        self._pos[node] = -1
+        if heap:
+            heap[0] = last
+            self._siftDown(0)
+        return node
+
+    def _siftUp(self, h):
+        """
+        Helper method to move the entry at h up to its place in the heap
+        """
+        heap = self._heap; prio = self._prio; pos = self._pos; d = self._d
+        node = heap[h]; p = prio[node]
+        while h > 0:
+            parent = (h - 1) // d
+            parentNode = heap[parent]
+            if prio[parentNode] <= p:
+                break
+            heap[h] = parentNode
+            pos[parentNode] = h
+            h = parent
+        heap[h] = node
+        pos[node] = h
+
+    def _siftDown(self, h):
+        """
+        Helper method to move the entry at h down to its place in the heap
+        """
+        heap = self._heap; prio = self._prio; pos = self._pos; d = self._d
+        size = len(heap)
+        node = heap[h]; p = prio[node]
+        while True:
+            first = d*h + 1
+            if first >= size:
+                break
+            best = first; bestPriority = prio[heap[first]]
+            for c in range(first + 1, min(first + d, size)):
+                cPriority = prio[heap[c]]
+                if cPriority < bestPriority:
+                    best = c; bestPriority = cPriority
+            if bestPriority >= p:
+                break
+            heap[h] = heap[best]
+            pos[heap[h]] = h
+            h = best
+        heap[h] = node
+        pos[node] = h
@@ -1,5 +1,6 @@
 import numpy as np
 import math
+import scipy.optimize
 
 def energy(X, Y, Z, SP, m, g, ca, cr):
     """
@@ -20,6 +21,156 @@ def energy(X, Y, Z, SP, m, g, ca, cr):
     return np.dot(F, D)
 
 
+def geometry(X, Y, Z):
+    """
+    Returns (D, sinVA, cosVA), the length and the sine and cosine of the
+    vertical angle of each segment of a track, the terms of energy that do
+    not depend on the speed profile.
+    """
+    assert X.shape == Y.shape and Y.shape == Z.shape
+    dX = X[1:]-X[:-1]
+    dY = Y[1:]-Y[:-1]
+    dZ = Z[1:]-Z[:-1]
+    D = np.sqrt(dX**2+dY**2+dZ**2)
+    sinVA = dZ/D
+    return D, sinVA, np.cos(np.arcsin(sinVA))
+
+
+def _isClosed(X, Y, Z):
+    """
+    Helper function returning whether the last point of a track is its first
+    one, up to rounding
+    """
+    return np.allclose([X[0], Y[0], Z[0]], [X[-1], Y[-1], Z[-1]])
+
+
+def energyBatch(X, Y, Z, SP, m, g, ca, cr, maxBytes = 64*2**20, numLaps = 1):
+    """
+    Returns the (P,) costs of the P speed profiles in the rows of SP. With
+    numLaps 1 each is energy(X, Y, Z, SP[p], m, g, ca, cr); with more, each
+    is the energy of the race of numLaps laps of the closed lap X, Y, Z,
+    i.e. energyGradient(X, Y, Z, SP[p], m, g, ca, cr, numLaps = numLaps)[0].
+
+    The geometry of the track is computed once for the whole batch, and the
+    rows are evaluated maxBytes at a time so memory does not grow with P.
+
+    Parameter SP: the speed profiles
+    Precondition: SP is a (P, n) float array with n == numLaps*(len(Z)-1)-1,
+    and X[0] == X[-1], Y[0] == Y[-1] and Z[0] == Z[-1] if numLaps > 1
+
+    Optional Parameter maxBytes: the memory budget of the intermediate arrays
+    Precondition: maxBytes is an int > 0
+
+    Optional Parameter numLaps: the number of laps of X, Y, Z, see
+    energyGradient
+    Precondition: numLaps is an int > 0
+    """
+    SP = np.asarray(SP, dtype=float)
+    numSegments = len(Z)-1
+    assert SP.ndim == 2 and numLaps > 0 and SP.shape[1] == numLaps*numSegments-1
+    assert numLaps == 1 or _isClosed(X, Y, Z), "the lap is not closed"
+    D, sinVA, cosVA = geometry(X, Y, Z)
+    # terms of F that do not depend on the speed
+    slope = m*g*sinVA + cr*m*g*cosVA
+    # about six (rows, n+2) float arrays are alive at once
+    chunkSize = max(1, maxBytes//(6*8*(SP.shape[1]+2)))
+    result = np.empty(len(SP))
+    for lo in range(0, len(SP), chunkSize):
+        rows = SP[lo:lo+chunkSize]
+        V = np.zeros((len(rows), SP.shape[1]+2))
+        V[:, 1:-1] = rows
+        # segment j of the race is segment j % numSegments of the lap
+        start = V[:, :-1].reshape(len(rows), numLaps, numSegments)
+        end = V[:, 1:].reshape(len(rows), numLaps, numSegments)
+        avgV = (end+start)/2
+        F = m*(end**2-start**2)/(2*D) + slope + ca*avgV**2
+        F = np.where(F>0, F, 0)
+        result[lo:lo+chunkSize] = (F @ D).sum(axis=1)
+    return result
+
+
+def energyGradient(X, Y, Z, SP, m, g, ca, cr, k = 0, tmax = 0, numLaps = 1):
+    """
+    Returns (cost, gradient) of a given speed profile, where cost is energy
+    plus the time penalty k*(time-tmax)^2 and gradient its exact derivative
+    with respect to SP.
+
+    Segment i only depends on V[i] and V[i+1], so dF_i/dV[i+1] is
+    m*V[i+1]/D_i + ca*avgV_i and dF_i/dV[i] is -m*V[i]/D_i + ca*avgV_i. The
+    clamp F = max(F, 0) passes the derivative only where F > 0, matching
+    np.where(F>0, F, 0) in energy. time is sum(D/avgV).
+
+    With numLaps > 1, X, Y, Z are one closed lap and the race goes around it
+    numLaps times: segment j of the race uses the geometry of segment
+    j % (len(Z)-1) of the lap through a (numLaps, len(Z)-1) view of the
+    speeds, so the track is not copied per lap. The speed is 0 only at the
+    start of the first lap and the end of the last one.
+
+    Precondition: as energy with len(SP) == numLaps*(len(Z)-1)-1, X[0] == X[-1],
+    Y[0] == Y[-1] and Z[0] == Z[-1] if numLaps > 1, and every avgV > 0 if k != 0
+    """
+    numSegments = len(Z)-1
+    assert X.shape == Y.shape and Y.shape == Z.shape and numLaps > 0
+    assert len(SP) == numLaps*numSegments-1
+    assert numLaps == 1 or _isClosed(X, Y, Z), "the lap is not closed"
+    V = np.zeros(len(SP)+2)
+    V[1:-1] = SP
+    start = V[:-1].reshape(numLaps, numSegments)
+    end = V[1:].reshape(numLaps, numSegments)
+    avgV = (end+start)/2
+    D, sinVA, cosVA = geometry(X, Y, Z)
+    F = m*(end**2-start**2)/(2*D) + m*g*sinVA + ca*avgV**2 + cr*m*g*cosVA
+    active = F>0
+    cost = np.sum(np.where(active, F, 0) @ D)
+    gradV = np.zeros(len(V))
+    gradV[1:] += np.where(active, m*end + ca*avgV*D, 0).reshape(-1)
+    gradV[:-1] += np.where(active, -m*start + ca*avgV*D, 0).reshape(-1)
+    if k != 0:
+        time = np.sum(D/avgV)
+        dTime = (-D/(2*avgV**2)).reshape(-1)
+        cost += k*(time-tmax)**2
+        gradV[1:] += 2*k*(time-tmax)*dTime
+        gradV[:-1] += 2*k*(time-tmax)*dTime
+    return cost, gradV[1:-1]
+
+
+def optimizeSpeedProfile(X, Y, Z, m, g, ca, cr, k = 0, tmax = 0, SP0 = None,
+                         lb = 0.01, ub = 30, analytic = True, maxiter = 3000,
+                         numLaps = 1):
+    """
+    Returns the scipy OptimizeResult of minimizing energy plus the time
+    penalty k*(time-tmax)^2 over the speed profile SP with bounds lb <= SP <= ub
+    by L-BFGS-B, the Python counterpart of fmincon in optimizer.m. result.x is
+    the speed profile and result.nfev the number of cost evaluations.
+
+    If analytic, the gradient is energyGradient; otherwise L-BFGS-B estimates
+    it by finite differences, which takes len(SP)+1 evaluations per gradient.
+
+    Parameter X, Y, Z: the points of the track, including both ends where the
+    speed is 0
+    Precondition: X, Y and Z are 1-D float arrays of the same length n > 2
+
+    Optional Parameter SP0: the initial speed profile, by default 0.5 as in
+    optimizer.m
+    Precondition: SP0 is None or a float array of length numLaps*(n-1)-1
+
+    Optional Parameter numLaps: the number of laps of the race around the
+    closed lap X, Y, Z, see energyGradient; tmax is the time of the whole race
+    Precondition: numLaps is an int > 0
+    """
+    n = numLaps*(len(Z) - 1) - 1
+    if SP0 is None:
+        SP0 = np.full(n, 0.5)
+    SP0 = np.clip(np.asarray(SP0, dtype=float), lb, ub)
+    if analytic:
+        fun = lambda SP: energyGradient(X, Y, Z, SP, m, g, ca, cr, k, tmax, numLaps)
+    else:
+        fun = lambda SP: energyGradient(X, Y, Z, SP, m, g, ca, cr, k, tmax, numLaps)[0]
+    return scipy.optimize.minimize(fun, SP0, jac = analytic, method = 'L-BFGS-B',
+                                   bounds = [(lb, ub)]*n,
+                                   options = {'maxiter': maxiter, 'maxfun': 500000})
+
+
 def energySanityTest():
     #TB Added
     X = np.array([0, 1, 0]); Y = np.array([0, 0, 0]); Z=np.array([0, 0, 0]); SP=np.array([1])
@@ -29,6 +180,35 @@ def energySanityTest():
     X = np.array([0, 1, 2]); Y = np.array([0, 0, 0]); Z=np.array([0, 2, 0]); SP=np.array([1])
     assert energy(X, Y, Z, SP, 1, 10, 0, 0)==20.5, "Expected: 20.5 but was "+str(energy(X, Y, Z, SP, 1, 10, 0, 0))
 
+
+def energyGradientSanityTest():
+    rng = np.random.default_rng(0)
+    t = np.linspace(0, 2*math.pi, 12)
+    X = 5*np.cos(t); Y = 3*np.sin(t); Z = np.sin(2*t)
+    for k in (0, 0.5):
+        SP = rng.uniform(1, 6, 10)
+        cost, grad = energyGradient(X, Y, Z, SP, 96, 9.8, 0.03675, 0.01, k, 10)
+        if k == 0:
+            assert cost == energy(X, Y, Z, SP, 96, 9.8, 0.03675, 0.01)
+        h = 1e-6
+        for i in range(len(SP)):
+            up = SP.copy(); up[i] += h
+            down = SP.copy(); down[i] -= h
+            numeric = (energyGradient(X, Y, Z, up, 96, 9.8, 0.03675, 0.01, k, 10)[0] -
+                       energyGradient(X, Y, Z, down, 96, 9.8, 0.03675, 0.01, k, 10)[0])/(2*h)
+            assert abs(numeric-grad[i]) <= 1e-4*max(1, abs(numeric)), "Expected: "+str(numeric)+" but was "+str(grad[i])
+
+
+def energyBatchSanityTest():
+    rng = np.random.default_rng(1)
+    t = np.linspace(0, 2*math.pi, 22)
+    X = 5*np.cos(t); Y = 3*np.sin(t); Z = np.sin(2*t)
+    SP = rng.uniform(0, 6, (100, 20))
+    expected = np.array([energy(X, Y, Z, row, 96, 9.8, 0.03675, 0.01) for row in SP])
+    for maxBytes in (1, 64*2**20):
+        batch = energyBatch(X, Y, Z, SP, 96, 9.8, 0.03675, 0.01, maxBytes)
+        assert np.allclose(batch, expected, rtol=1e-12, atol=0), "Expected: "+str(expected)+" but was "+str(batch)
+
 # energySanityTest()
 #
 #     e=0;
@@ -0,0 +1,240 @@
+import collections
+import math
+import threading
+import time
+import numpy as np
+
+Sample = collections.namedtuple('Sample', ['time', 'x', 'y', 'heading'])
+Sample.__doc__ = """
+A telemetry sample: timestamp in seconds, position in track coordinates and
+heading in radians between 0 and 2pi.
+"""
+
+Recommendation = collections.namedtuple('Recommendation',
+    ['time', 'node', 'nextNode', 'lane', 'targetSpeed', 'energyToGo'])
+Recommendation.__doc__ = """
+The recommendation for a Sample: the node the car was matched to, the next
+node to head for and its lane, the target speed there and the optimal
+remaining energy. nextNode and lane are -1 at the finish.
+"""
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies in logarithmic bins from 1 microsecond to 1 second.
+    """
+    # edges = upper edges of the bins in seconds, the last bin is unbounded
+    # counts = number of latencies recorded in each bin
+
+    def __init__(self, binsPerDecade = 4):
+        """
+        Initializes an empty histogram.
+
+        Optional Parameter binsPerDecade: the number of bins per power of 10
+        Precondition: binsPerDecade is an int > 0
+        """
+        assert binsPerDecade > 0
+        self.edges = np.logspace(-6, 0, 6*binsPerDecade + 1)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+
+    def __len__(self):
+        """
+        Overrides python function "len(LatencyHistogram)"
+        """
+        return int(self.counts.sum())
+
+    def record(self, latency):
+        """
+        Adds a latency in seconds to the histogram.
+        """
+        self.counts[np.searchsorted(self.edges, latency)] += 1
+
+    def percentile(self, p):
+        """
+        Returns the upper edge of the bin containing the p-th percentile of the
+        recorded latencies, or inf if it is in the unbounded last bin. The
+        percentile is the latency of rank ceil(p/100*len) counting from 1, so
+        that the 0th is the smallest latency, in the first non-empty bin.
+
+        Parameter p: the percentile
+        Precondition: p is a number in [0, 100] and the histogram is not empty
+        """
+        assert len(self) > 0 and 0 <= p <= 100
+        rank = max(1, math.ceil(p/100*len(self)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return float(self.edges[index]) if index < len(self.edges) else math.inf
+
+    def __str__(self):
+        """
+        Overrides python function str(LatencyHistogram)
+        """
+        lines = []
+        lower = 0.0
+        for edge, count in zip(self.edges, self.counts):
+            if count:
+                lines.append("%9.1f - %9.1f us: %d" % (lower*1e6, edge*1e6, count))
+            lower = edge
+        if self.counts[-1]:
+            lines.append("%9.1f -       inf us: %d" % (lower*1e6, self.counts[-1]))
+        return "\n".join(lines)
+
+
+class TelemetryBuffer:
+    """
+    Bounded buffer between a telemetry receiver (e.g. a serial or UDP thread)
+    and the recommend generator.
+
+    If the planner falls behind, push drops the oldest pending samples rather
+    than blocking the receiver, because only the latest position matters for
+    a recommendation. The number of dropped samples is kept in dropped.
+    """
+    # _pending = deque of (sample, receivedAt) pairs waiting to be processed
+    # _condition = condition variable guarding _pending and _closed
+    # _closed = whether close has been called
+    # dropped = number of samples dropped because the buffer was full
+
+    def __init__(self, maxPending = 64):
+        """
+        Initializes an empty buffer.
+
+        Optional Parameter maxPending: the number of samples kept at most
+        Precondition: maxPending is an int > 0
+        """
+        assert maxPending > 0
+        self._pending = collections.deque(maxlen=maxPending)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def __len__(self):
+        """
+        Overrides python function "len(TelemetryBuffer)"
+        """
+        return len(self._pending)
+
+    def push(self, sample):
+        """
+        Adds a sample, dropping the oldest pending one if the buffer is full.
+        Returns False if a sample was dropped, i.e. the consumer is too slow.
+
+        Parameter sample: the received sample
+        Precondition: sample is a Sample
+        """
+        with self._condition:
+            full = len(self._pending) == self._pending.maxlen
+            if full:
+                self.dropped += 1
+            self._pending.append((sample, time.perf_counter()))
+            self._condition.notify()
+        return not full
+
+    def close(self):
+        """
+        Marks the end of the telemetry; batches stops once the buffer is empty.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def batches(self, timeout = None):
+        """
+        Generator of lists of all the (sample, receivedAt) pairs pending at
+        the time, waiting for at least one, until the buffer is closed and
+        empty.
+
+        Optional Parameter timeout: seconds to wait for a sample before
+        stopping, or None to wait until close
+        Precondition: timeout is None or a number >= 0
+        """
+        while True:
+            with self._condition:
+                if not self._pending and not self._closed:
+                    self._condition.wait(timeout)
+                if not self._pending:
+                    return
+                batch = list(self._pending)
+                self._pending.clear()
+            yield batch
+
+
+def singleBatches(samples):
+    """
+    Generator adapting an iterable of Samples to the batches consumed by
+    recommend, one sample per batch, received when it is read.
+    """
+    for sample in samples:
+        yield [(sample, time.perf_counter())]
+
+
+def nodeSpeeds(graph, path, speedProfile):
+    """
+    Returns the (len(graph),) array of the planned speed at each node of a
+    CompactTrackGraph, from a planned path and the speed at each of its
+    nodes, e.g. those of JointPlanner.jointPlan. Nodes the path does not pass
+    through are nan.
+
+    Parameter graph: the planned graph
+    Precondition: graph is a CompactTrackGraph
+
+    Parameter path, speedProfile: the node indices of the planned path and
+    the speed at each of them
+    Precondition: path and speedProfile are sequences of the same length
+    """
+    assert len(path) == len(speedProfile)
+    speeds = np.full(len(graph), np.nan)
+    speeds[np.asarray(path, dtype=np.int64)] = speedProfile
+    return speeds
+
+
+def recommend(batches, graphKDTree, table, speeds, histogram = None):
+    """
+    Generator of a Recommendation for every sample of batches.
+
+    Each batch is map-matched in one call to getClosestForwardNodeIndices,
+    the next node comes from the precomputed CostToGoTable and its target
+    speed from the planned speed at that node, so the work per
+    sample is a KD query and a few array reads. The generator only pulls a
+    batch when the previous one has been consumed, which is the backpressure
+    towards the source.
+
+    Parameter batches: the samples to process, e.g. TelemetryBuffer.batches()
+    or singleBatches(samples)
+    Precondition: batches is an iterable of lists of (Sample, receivedAt)
+    pairs, receivedAt being a time.perf_counter() value
+
+    Parameter graphKDTree: the KDTree of the planned graph
+    Precondition: graphKDTree is a TrackNodeKDTree of a CompactTrackGraph
+
+    Parameter table, speeds: the plan and the planned speed at each node,
+    e.g. CostToGoTable.fromPath(graph, path) and nodeSpeeds(graph, path,
+    speedProfile) for the path and speeds of JointPlanner.jointPlan
+    Precondition: table is a CostToGoTable of the graph of graphKDTree and
+    speeds a sequence of len(graph) numbers, not nan at the nodes of the path
+    of table, i.e. both come from the same plan
+
+    Optional Parameter histogram: histogram to record the latency from
+    receipt to recommendation of every sample in
+    Precondition: histogram is None or a LatencyHistogram
+    """
+    graph = graphKDTree.graph
+    numArrs = graph.numArrs
+    speeds = np.asarray(speeds, dtype=float)
+    assert speeds.shape == (len(graph),)
+    for batch in batches:
+        if not batch:
+            continue
+        samples = [sample for sample, _ in batch]
+        points = np.array([(sample.x, sample.y) for sample in samples])
+        headings = np.array([sample.heading for sample in samples]) % (2*math.pi)
+        nodes = graphKDTree.getClosestForwardNodeIndices(points, headings)
+        nextNodes = table.successor[nodes]
+        lanes = np.where(nextNodes >= 0, nextNodes % numArrs, -1)
+        targets = speeds[np.where(nextNodes >= 0, nextNodes, nodes)]
+        energies = table.costToGo[nodes]
+        for i, (sample, receivedAt) in enumerate(batch):
+            recommendation = Recommendation(sample.time, int(nodes[i]),
+                int(nextNodes[i]), int(lanes[i]), float(targets[i]),
+                float(energies[i]))
+            if histogram is not None:
+                histogram.record(time.perf_counter() - receivedAt)
+            yield recommendation
@@ -0,0 +1,99 @@
+import math
+import numpy as np
+
+def _borders(center, heights, width):
+    """
+    Helper function returning inner and outer border datapoints offset by
+    width/2 to either side of the closed centerline center in the xy plane,
+    at the given heights
+    """
+    tangent = np.roll(center, -1, axis=0) - np.roll(center, 1, axis=0)
+    tangent /= np.hypot(tangent[:, 0], tangent[:, 1])[:, None]
+    normal = np.column_stack((-tangent[:, 1], tangent[:, 0])) # to the left
+    inside = np.column_stack((center + normal*width/2, heights))
+    out = np.column_stack((center - normal*width/2, heights))
+    return inside.tolist(), out.tolist()
+
+
+def ellipseTrack(numStations, a = 5, b = 3, width = 1):
+    """
+    Returns inner and outer border datapoints of an elliptical track with
+    numStations points each, in the same form as the loops in Optimizer.py.
+
+    Parameter numStations: The number of points on each border
+    Precondition: numStations is an int > 2
+
+    Optional Parameter a, b: The semi axes of the outer border
+    Precondition: a and b are numbers > width
+
+    Optional Parameter width: The width of the track
+    Precondition: width is a number > 0
+    """
+    assert numStations > 2
+    theta = np.linspace(0, 2*math.pi, numStations, endpoint=False)
+    inside = np.column_stack(((a-width)*np.cos(theta), (b-width)*np.sin(theta),
+                              np.sin(theta)))
+    out = np.column_stack((a*np.cos(theta), b*np.sin(theta), np.cos(theta)))
+    return inside.tolist(), out.tolist()
+
+
+def figureEightTrack(numStations, a = 10, width = 1, height = 1):
+    """
+    Returns inner and outer border datapoints of a figure-eight track (a
+    lemniscate of Gerono) with numStations points each. The two passes
+    through the crossing are height apart vertically, as on a bridge.
+
+    Parameter numStations: The number of points on each border
+    Precondition: numStations is an int > 2
+
+    Optional Parameter a: The half length of the track
+    Precondition: a is a number > width
+
+    Optional Parameter width: The width of the track
+    Precondition: width is a number > 0
+
+    Optional Parameter height: The height of the bridge
+    Precondition: height is a number
+    """
+    assert numStations > 2
+    theta = np.linspace(0, 2*math.pi, numStations, endpoint=False)
+    center = np.column_stack((a*np.sin(theta), a*np.sin(theta)*np.cos(theta)))
+    return _borders(center, height/2*np.cos(theta), width)
+
+
+def noisyElevationTrack(numStations, a = 50, b = 30, width = 5, amplitude = 2,
+                        numHarmonics = 8, seed = 0):
+    """
+    Returns inner and outer border datapoints of an elliptical track with
+    numStations points each whose elevation is a random smooth periodic
+    profile: a sum of numHarmonics sines of decreasing amplitude.
+
+    Parameter numStations: The number of points on each border
+    Precondition: numStations is an int > 2
+
+    Optional Parameter a, b: The semi axes of the centerline
+    Precondition: a and b are numbers > width
+
+    Optional Parameter width: The width of the track
+    Precondition: width is a number > 0
+
+    Optional Parameter amplitude: The amplitude of the first harmonic
+    Precondition: amplitude is a number
+
+    Optional Parameter numHarmonics, seed: The number of harmonics and the
+    seed of their random phases and amplitudes
+    Precondition: numHarmonics is an int > 0 and seed an int
+    """
+    assert numStations > 2
+    rng = np.random.default_rng(seed)
+    theta = np.linspace(0, 2*math.pi, numStations, endpoint=False)
+    harmonics = np.arange(1, numHarmonics + 1)
+    amplitudes = amplitude*rng.uniform(0.5, 1, numHarmonics)/harmonics
+    phases = rng.uniform(0, 2*math.pi, numHarmonics)
+    heights = np.sin(np.outer(theta, harmonics) + phases) @ amplitudes
+    center = np.column_stack((a*np.cos(theta), b*np.sin(theta)))
+    return _borders(center, heights, width)
+
+
+GENERATORS = {"ellipse": ellipseTrack, "figureEight": figureEightTrack,
+              "noisyElevation": noisyElevationTrack}
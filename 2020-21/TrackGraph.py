@@ -1,6 +1,15 @@
 from TrackNodeHeap import *
+from CompactTrackGraph import *
+from TrackSearch import *
+from CostToGoTable import *
+from IncrementalPlanner import *
 import numpy as np
 import math
+import collections
+
+# the speed and vehicle constants of energy, which are its defaults
+VehicleConfig = collections.namedtuple('VehicleConfig', ['v', 'm', 'g', 'CoeffAR', 'CoeffRR'],
+                                       defaults=[5, 96, 9.8, 0.01, 0.03])
 
 class TrackNodeInfo():
     """
@@ -120,6 +129,8 @@ def energy(a, b, v):
     m = 96; g = 9.8; CoeffAR = 0.01; CoeffRR = 0.03; # CoeffCR = 0
     # m = 100; g = 10; CoeffAR = 0; CoeffRR = 0;
     dist = math.sqrt((b.x - a.x)**2+(b.y - a.y)**2+(b.z - a.z)**2)
+    if dist == 0:
+        return 0
     va = math.asin((b.z - a.z)/dist)
     force = CoeffAR*v**2 + CoeffRR*m*g*math.cos(va) + m*g*math.sin(va) # + CoeffCR*sa
     energy = dist*force
@@ -127,7 +138,105 @@ def energy(a, b, v):
         energy = 0
     return energy
 
-def interpolate(innerData, outerData):
+def energyLowerBound(coordinates, goal, config = VehicleConfig()):
+    """
+    Returns an array with a lower bound of the energy of any path from each
+    of the given points to goal at the constant speed v of config.
+
+    Every edge costs at least dist*(CoeffAR*v**2 + CoeffRR*m*g*cos(va)) +
+    m*g*dz, and the sum of the edge lengths (horizontal lengths) along a path
+    is at least the straight line distance (horizontal distance) to goal, so
+    the bound is the air and rolling resistance over the straight line plus
+    the net climb to goal, clamped at 0. By the triangle inequality it is
+    also consistent, so it can be used as an A* heuristic.
+
+    Parameter coordinates: The points to bound the energy from
+    Precondition: coordinates is a (N, 3) array
+
+    Parameter goal: The end of the paths
+    Precondition: goal is a sequence of length 3
+
+    Optional Parameter config: the speed and vehicle the edge weights were
+    computed for, by default the speed and constants of energy
+    Precondition: config is a VehicleConfig
+    """
+    v, m, g, CoeffAR, CoeffRR = config # CoeffCR = 0
+    delta = np.asarray(goal, dtype=float)[:3] - coordinates
+    horizontal = np.sqrt(delta[:, 0]**2 + delta[:, 1]**2)
+    straight = np.sqrt(horizontal**2 + delta[:, 2]**2)
+    bound = CoeffAR*v**2*straight + CoeffRR*m*g*horizontal + m*g*delta[:, 2]
+    # shave a relative epsilon so that rounding never breaks admissibility
+    return np.maximum(bound*(1 - 1e-9), 0)
+
+def edgeWeights(arrayList, v = 5):
+    """
+    Returns an array W of shape (arrLen, numArrs, numArrs) where W[i][a][b] is
+    energy(arrayList[a][i], arrayList[b][i+1], v), the last station wrapping
+    around to the first one. All the weights of createGraph are computed in
+    one vectorized pass.
+
+    Parameter arrayList: The datapoints of the lanes
+    Precondition: arrayList is a list of matrices of equal shape with row
+    vectors of length at least 3.
+
+    Optional Parameter v: The constant speed of the vehicle
+    Precondition: v is a number
+    """
+    assert len(arrayList) > 0
+    m = 96; g = 9.8; CoeffAR = 0.01; CoeffRR = 0.03; # CoeffCR = 0
+    P = np.stack([np.asarray(points, dtype=float)[:, :3]
+                  for points in arrayList], axis=1) # P[i][a] = arrayList[a][i]
+    Q = np.roll(P, -1, axis=0)
+    delta = Q[:, None, :, :] - P[:, :, None, :]
+    dist = np.sqrt(delta[..., 0]**2 + delta[..., 1]**2 + delta[..., 2]**2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        va = np.arcsin(delta[..., 2]/dist)
+    force = CoeffAR*v**2 + CoeffRR*m*g*np.cos(va) + m*g*np.sin(va)
+    weights = dist*force
+    weights[(weights < 0) | (dist == 0)] = 0
+    return weights
+
+def weightTensor(graph, configs):
+    """
+    Returns a (C, E) array whose row c holds the weight of every edge of a
+    CompactTrackGraph for configs[c], the energy at constant speed of
+    energy with the speed and constants of that VehicleConfig.
+
+    Per edge, dist*cos(va) is the horizontal length and dist*sin(va) the
+    rise, so the weight is CoeffAR*v**2*dist + CoeffRR*m*g*horizontal +
+    m*g*rise clamped at 0: three coefficients per config times the cached
+    graph.edgeGeometry(), one broadcast for all configs. The weights match
+    edgeWeights up to rounding.
+
+    Parameter graph: the graph to weigh
+    Precondition: graph is a CompactTrackGraph
+
+    Parameter configs: the speeds and vehicles
+    Precondition: configs is a list of VehicleConfigs
+    """
+    dist, horizontal, rise = graph.edgeGeometry()
+    v, m, g, CoeffAR, CoeffRR = (np.array(column, dtype=float)[:, None]
+                                 for column in zip(*configs))
+    weights = CoeffAR*v**2*dist + CoeffRR*m*g*horizontal + m*g*rise
+    weights[(weights < 0) | (dist == 0)[None, :]] = 0
+    return weights
+
+def useConfigs(graph, configs):
+    """
+    Stores configs and their weightTensor in graph.configs and
+    graph.configWeights, so that optimumPath can search with the weights of
+    any of them through its config index without rebuilding the graph.
+
+    Parameter graph: the graph to weigh
+    Precondition: graph is a CompactTrackGraph
+
+    Parameter configs: the speeds and vehicles
+    Precondition: configs is a list of VehicleConfigs
+    """
+    graph.configs = list(configs)
+    graph.configWeights = weightTensor(graph, graph.configs)
+
+def interpolate(innerData, outerData, numArrs = 5):
     """
     Returns a list of arrays of row vectors in the form of [Inner Track,
     First Quarter, Middle Track, Second Quarter, Outer Track]
@@ -137,12 +246,19 @@ def interpolate(innerData, outerData):
 
     Parameter outerData: The datapoints for the outer border of the track.
     Precondition: outerData is a list of row vectors  with same length as innerData.
+
+    Optional Parameter numArrs: The number of lanes, evenly spaced from the
+    inner to the outer border; 5 gives the list above.
+    Precondition: numArrs is an int > 1
     """
     assert len(innerData) == len(outerData)
     assert len(innerData) > 0
     assert len(innerData[0]) == len(outerData[0])
+    assert numArrs > 1
     IN = np.array(innerData)
     OUT = np.array(outerData)
+    if numArrs != 5:
+        return [IN + (OUT - IN)*(k/(numArrs - 1)) for k in range(numArrs - 1)] + [OUT]
     MID = (IN + OUT)/2
     FQ = (IN + MID)/2
     SQ = (MID + OUT)/2
@@ -164,31 +280,144 @@ def createGraph(arrayList, clockwise = True):
     assert len(arrayList) > 0 and type(clockwise)==bool
     numArrs = len(arrayList)
     arrLen = len(arrayList[0])
+    weights = edgeWeights(arrayList, 5).tolist()
     graph = [] # node corresponding arrayList[h][k] = graph[k*numArrs+h]
     for i in range(arrLen):
-        for points in arrayList:
+        for h, points in enumerate(arrayList):
             node = TrackNode(points[i][0], points[i][1], points[i][2])
             graph.append(node)
             if i != 0:
                 for index in range(numArrs):
                     fromNode = graph[(i-1)*numArrs+index]
-                    weight = energy(fromNode, node, 5)
-                    Edge(weight, fromNode, node)
-    for points in arrayList:
+                    Edge(weights[i-1][index][h], fromNode, node)
+    for h in range(numArrs):
+        toNode = graph[h]
         for index in range(numArrs):
             fromNode = graph[(arrLen-1)*numArrs+index]
-            toNode = graph[index]
-            weight = energy(fromNode, toNode, 5)
-            Edge(weight, fromNode, toNode)
+            Edge(weights[arrLen-1][index][h], fromNode, toNode)
     return graph
 
-def optimumPath(graphKDTree, current_position, goal_point):
+def createCompactGraph(arrayList, clockwise = True):
     """
+    Returns a CompactTrackGraph with the same nodes, edges and weights as
+    createGraph(arrayList, clockwise) but stored in flat arrays.
+
+    Parameter arrayList: The datapoints from which to create the graphs
+    Precondition: arrayList is a list of matrices with row vectors where the ith
+    row vector of a matrix can have edges to the (i+1)th row vectors or (i-1)th
+    row vectors of all the matrices if clockwise is true or false respectively.
+
+    Optional Parameter clockwise: Traversal direction is clockwise or not.
+    Precondition: clockwise is a bool.
     """
+    assert len(arrayList) > 0 and type(clockwise)==bool
+    numArrs = len(arrayList)
+    arrLen = len(arrayList[0])
+    # node corresponding arrayList[h][k] = coordinates[k*numArrs+h]
+    coordinates = np.stack([np.asarray(points, dtype=float)[:, :3]
+                            for points in arrayList], axis=1).reshape(-1, 3)
+    numNodes = numArrs*arrLen
+    indexType = np.int32 if numNodes < 2**31 else np.int64
+    # every node has an edge to each lane of the next station, the last
+    # station wrapping around to the first one.
+    indptr = np.arange(numNodes+1, dtype=np.int64)*numArrs
+    nextStation = (np.arange(arrLen, dtype=indexType)+1) % arrLen
+    targets = nextStation[:, None]*numArrs + np.arange(numArrs, dtype=indexType)
+    indices = np.repeat(targets, numArrs, axis=0).reshape(-1)
+    weights = edgeWeights(arrayList, 5).reshape(-1)
+    return CompactTrackGraph(coordinates, indptr, indices, weights, numArrs, arrLen)
+
+def optimumPath(graphKDTree, current_position, goal_point, method = "dijkstra",
+                queue = None, laps = 1, config = None):
+    """
+    Returns (path, energy) for the minimum energy path between the nodes
+    closest to current_position and goal_point.
+
+    Parameter graphKDTree: the KDTree of the graph to search
+    Precondition: graphKDTree is a TrackNodeKDTree
+
+    Parameter current_position, goal_point: the ends of the path
+    Precondition: current_position and goal_point are lists of length 2
+
+    Optional Parameter method: the search algorithm. "dijkstra" is
+    Dijkstra's algorithm with the priority queue given by queue, "astar" is
+    A* guided by energyLowerBound (see shortestPath) and "stations" sweeps
+    the stations without a queue (see stationSweep).
+    Precondition: method is "dijkstra", "astar" or "stations"
+
+    Optional Parameter queue: the priority queue of "dijkstra" and "astar".
+    "trackNodeHeap" searches the TrackNode objects with a TrackNodeHeap and
+    works on any graph; "heapq" and "dary" search the arrays of a
+    CompactTrackGraph with a LazyHeapQueue or an IndexedDaryHeap. By default
+    "trackNodeHeap" for "dijkstra" and "heapq" for "astar".
+    Precondition: queue is None, "trackNodeHeap", "heapq" or "dary", and None
+    for "stations"
+
+    Optional Parameter laps: the number of laps of the race, the last one
+    ending at goal_point (see multiLapSweep); with more than one the path is
+    a MultiLapPath of the nodes, generated as it is read
+    Precondition: laps is an int > 0, and method is "stations" if laps > 1
+
+    Optional Parameter config: the index of the VehicleConfig of the graph to
+    weigh the edges with, by default the weights the graph was created with
+    Precondition: config is None or an int, and useConfigs was called on the
+    CompactTrackGraph of graphKDTree if it is an int
+
+    Every method but "dijkstra" with the "trackNodeHeap" queue needs the
+    graph of graphKDTree to be a CompactTrackGraph, e.g. from
+    createCompactGraph, not the TrackNodes of createGraph.
+
+    The 4th positional argument used to be the queue: a call such as
+    optimumPath(kdTree, a, b, "heapq") now fails its precondition and must
+    be written optimumPath(kdTree, a, b, queue = "heapq").
+    """
+    assert method in ("dijkstra", "astar", "stations"), "unknown method " + repr(method)
+    if method == "stations":
+        assert queue is None, "the stations method does not use a queue"
+    elif queue is None:
+        queue = "trackNodeHeap" if method == "dijkstra" else "heapq"
+    assert queue in (None, "trackNodeHeap", "heapq", "dary"), "unknown queue " + repr(queue)
+    assert method != "astar" or queue != "trackNodeHeap", \
+        "the astar method needs the heapq or dary queue"
+    assert laps > 0
+    assert laps == 1 or method == "stations", \
+        "races of more than one lap need the stations method"
+    compact = queue != "trackNodeHeap"
+    assert config is None or compact, \
+        "a config needs the heapq or dary queue or the stations method"
+    graph = graphKDTree.graph
+    assert not compact or isinstance(graph, CompactTrackGraph), \
+        "method %r needs a CompactTrackGraph (see createCompactGraph)" % method
     # IF you want to find nodes closest to start and end points
     start = graphKDTree.getClosestNode(current_position)
     end = graphKDTree.getClosestNode(goal_point)
 
+    if compact:
+        searchGraph = graph
+        if config is not None:
+            searchGraph = graph.withWeights(graph.configWeights[config])
+        if method == "stations":
+            if laps > 1:
+                result = multiLapSweep(searchGraph, start.index, end.index, laps)
+                if result is None:
+                    return None
+                path, energy = result
+                return path.map(graph.__getitem__), energy
+            result = stationSweep(searchGraph, start.index, end.index)
+            if result is None:
+                return None
+            path, energy = result
+            return [graph[index] for index in path], energy
+        heuristic = None
+        if method == "astar":
+            heuristic = energyLowerBound(graph.coordinates, graph.coordinates[end.index],
+                VehicleConfig() if config is None else graph.configs[config])
+        result = shortestPath(searchGraph, start.index, end.index, queue, heuristic)
+        if result is None:
+            return None
+        path, energy, _ = result
+        return [graph[index] for index in path], energy
+
     # The priority of a node will be the length of discovered
     # shortest path from v to the node.
     F= TrackNodeHeap(False);
@@ -239,3 +468,30 @@ def optimumPath(graphKDTree, current_position, goal_point):
                 wInfo.dist= pathLength
                 wInfo.bkptr= f
                 F.updatePriority(w, pathLength)
+
+def searchReport(graphKDTree, current_position, goal_point, queue = "heapq"):
+    """
+    Returns a dictionary with the energy of the optimum path between the nodes
+    closest to current_position and goal_point and the number of nodes
+    settled by Dijkstra and by A* to find it.
+
+    Parameter graphKDTree: the KDTree of the graph to search
+    Precondition: graphKDTree is a TrackNodeKDTree of a CompactTrackGraph
+
+    Parameter current_position, goal_point: the ends of the path
+    Precondition: current_position and goal_point are lists of length 2
+
+    Optional Parameter queue: the priority queue backend, see makeQueue
+    Precondition: queue is "heapq" or "dary"
+    """
+    graph = graphKDTree.graph
+    assert isinstance(graph, CompactTrackGraph)
+    start = graphKDTree.getClosestNode(current_position).index
+    end = graphKDTree.getClosestNode(goal_point).index
+    heuristic = energyLowerBound(graph.coordinates, graph.coordinates[end])
+    dijkstra = shortestPath(graph, start, end, queue)
+    astar = shortestPath(graph, start, end, queue, heuristic)
+    if dijkstra is None:
+        return None
+    return {"energy": dijkstra[1], "astarEnergy": astar[1],
+            "dijkstraSettled": dijkstra[2], "astarSettled": astar[2]}
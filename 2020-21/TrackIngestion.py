@@ -0,0 +1,166 @@
+import hashlib
+import os
+import numpy as np
+
+# bump when the processing below changes so that stale artifacts are rebuilt
+ARTIFACT_VERSION = 1
+EARTH_RADIUS = 6378000
+
+def readTrackData(path):
+    """
+    Returns the (n, 5) float array of rows [latitude, longitude, ECEF x,
+    ECEF y, ECEF z] of a track data file such as 2019-20/MATLAB/td.xls.
+
+    Spreadsheets are read with pandas, which is only needed for them; comma
+    separated text files are read with NumPy.
+
+    Parameter path: the track data file
+    Precondition: path is a .xls, .xlsx or .csv file with 5 columns and no
+    header row
+    """
+    if os.path.splitext(path)[1].lower() in (".xls", ".xlsx"):
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError("reading " + path + " requires pandas (and xlrd for .xls)")
+        trackData = pandas.read_excel(path, header=None).to_numpy(dtype=float)
+    else:
+        trackData = np.loadtxt(path, delimiter=",", ndmin=2)
+    assert trackData.ndim == 2 and trackData.shape[1] == 5
+    return trackData
+
+
+def localCoordinates(trackData):
+    """
+    Returns the (n, 4) array of rows [x, y, z, distance] of the track data,
+    converted as in optimizer.m: x and y in meters from the latitude and
+    longitude, z the height above the lowest point from the ECEF radius, and
+    distance the cumulative 2D distance from the first point.
+
+    Parameter trackData: the rows of readTrackData
+    Precondition: trackData is a (n, 5) float array
+    """
+    latitude = trackData[:, 0]
+    x = latitude*111000
+    y = trackData[:, 1]*np.cos(np.radians(latitude))*111321
+    z = np.sqrt(np.sum(trackData[:, 2:5]**2, axis=1)) - EARTH_RADIUS
+    z = z - z.min()
+    distance = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))])
+    return np.column_stack((x, y, z, distance))
+
+
+def smooth(values, span = 5):
+    """
+    Returns the moving average of values over span points, like MATLAB
+    smooth: the span shrinks near the ends so that it stays centered.
+
+    Parameter values: the values to smooth
+    Precondition: values is a 1-D float array
+
+    Optional Parameter span: the number of points averaged
+    Precondition: span is an odd int > 0
+    """
+    assert span > 0 and span % 2 == 1
+    n = len(values)
+    index = np.arange(n)
+    half = np.minimum(np.minimum(index, n - 1 - index), span//2)
+    total = np.concatenate([[0.0], np.cumsum(values)])
+    return (total[index + half + 1] - total[index - half])/(2*half + 1)
+
+
+def removeDupes(array):
+    """
+    Returns the rows of array without consecutive duplicate points, i.e.
+    without the rows whose x, y and distance equal those of the next row,
+    as removedupes in optimizer.m.
+
+    Parameter array: the rows [x, y, z, distance]
+    Precondition: array is a (n, 4) float array
+    """
+    if len(array) < 2:
+        return array
+    same = np.all(array[:-1, [0, 1, 3]] == array[1:, [0, 1, 3]], axis=1)
+    return array[np.concatenate([~same, [True]])]
+
+
+def trackBoundaries(trackData, width = 6, span = 5):
+    """
+    Returns (inner, outer), the (n, 3) arrays of the borders of the track
+    whose centerline is the track data: the points are converted, z is
+    smoothed, duplicate points are removed and the centerline is offset by
+    width/2 to each side in the xy plane. inner is the side towards the
+    inside of the loop.
+
+    Parameter trackData: the rows of readTrackData
+    Precondition: trackData is a (n, 5) float array with n > 2
+
+    Optional Parameter width: the width of the track in meters
+    Precondition: width is a number > 0
+
+    Optional Parameter span: the span of the smoothing of z
+    Precondition: span is an odd int > 0
+    """
+    points = localCoordinates(trackData)
+    points[:, 2] = smooth(points[:, 2], span)
+    points = removeDupes(points)
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    dx = np.gradient(x); dy = np.gradient(y)
+    length = np.hypot(dx, dy)
+    # unit normal to the left of the direction of travel
+    normal = np.column_stack((-dy/length, dx/length))
+    # the left side is inside if the loop is counterclockwise
+    area = np.sum(x*np.roll(y, -1) - np.roll(x, -1)*y)/2
+    if area < 0:
+        normal = -normal
+    center = np.column_stack((x, y))
+    inner = np.column_stack((center + normal*width/2, z))
+    outer = np.column_stack((center - normal*width/2, z))
+    return inner, outer
+
+
+def artifactPath(path, width = 6, span = 5, cacheDir = None):
+    """
+    Returns the path of the artifact of the track data file path, which is
+    keyed by the artifact version, the parameters and a hash of the contents
+    of the file so that an edited file or changed processing is rebuilt.
+
+    Optional Parameter cacheDir: the directory of the artifacts, by default
+    the directory of path
+    Precondition: cacheDir is None or a directory path
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(repr((ARTIFACT_VERSION, float(width), int(span))).encode())
+    if cacheDir is None:
+        cacheDir = os.path.dirname(os.path.abspath(path))
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cacheDir, "%s.v%d.%s.npy" % (name, ARTIFACT_VERSION,
+                                                     digest.hexdigest()[:16]))
+
+
+def loadTrack(path, width = 6, span = 5, cacheDir = None):
+    """
+    Returns (inner, outer) of trackBoundaries for the track data file path,
+    memory-mapped read only from its artifact. The first call for a file
+    parses it and writes the artifact, a (2, n, 3) float64 .npy file; later
+    calls only hash the file and map the artifact.
+
+    The arrays can be passed to interpolate or InterpolatedTrackKDTree.
+
+    Parameter path: the track data file, see readTrackData
+
+    Optional Parameter width, span: see trackBoundaries
+
+    Optional Parameter cacheDir: see artifactPath
+    """
+    artifact = artifactPath(path, width, span, cacheDir)
+    if not os.path.exists(artifact):
+        boundaries = np.stack(trackBoundaries(readTrackData(path), width, span))
+        temporary = artifact + ".%d.tmp" % os.getpid()
+        with open(temporary, "wb") as file:
+            np.save(file, boundaries)
+        os.replace(temporary, artifact) # atomic, so readers never see a partial file
+    boundaries = np.load(artifact, mmap_mode="r")
+    return boundaries[0], boundaries[1]
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from sklearn.neighbors import KDTree
 
 class TrackNodeKDTree(KDTree):
@@ -11,13 +12,21 @@ class TrackNodeKDTree(KDTree):
         Creates a KDTree of TrackNode objects.
 
         Parameter data: The TrackNode obejcts of the graph to create a KDTree for.
-        Precondition: data is a List of TrackNode objects.
+        Precondition: data is a List of TrackNode objects or a CompactTrackGraph.
         """
         self._data = data
-        self._coordinates = self._projectTo2D(self._data)
+        self._coordinates = np.asarray(self._projectTo2D(self._data), dtype=float)
         super().__init__(self._coordinates)
 
 
+    @property
+    def graph(self):
+        """
+        The TrackNodes (or CompactTrackGraph) this KDTree was created for.
+        """
+        return self._data
+
+
     def getClosestNode(self, point):
         """
         Return closest TrackNode to the given point.
@@ -59,13 +68,59 @@ class TrackNodeKDTree(KDTree):
         return self.getClosestNode(point)
 
 
+    def getClosestNodeIndices(self, points):
+        """
+        Return the indices in the graph of the closest TrackNode to each point.
+
+        Parameter points: the points to which the closest nodes are to be found.
+        Precondition: points is an array-like of shape (M, 2)
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return self.query(points, return_distance = False)[:, 0]
+
+
+    def getClosestForwardNodeIndices(self, points, headings, k = 4):
+        """
+        Return the indices in the graph of the closest TrackNode in front of
+        each point, as getClosestForwardNode does for one point, checking the
+        k nearest candidates of all points at once.
+
+        Parameter points: the points to which the closest nodes are to be found.
+        Precondition: points is an array-like of shape (M, 2)
+
+        Parameter headings: the current heading at each point in radians
+        Precondition: headings is an array-like of shape (M,) with values
+        between 0 and 2pi
+
+        Optional Parameter k: the number of nearest candidates to check
+        Precondition: k is an int > 0
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        headings = np.asarray(headings, dtype=float).reshape(-1)
+        assert len(headings) == len(points)
+        assert np.all((0 <= headings) & (headings < 2*math.pi))
+        headings = np.where(headings > math.pi, headings - 2*math.pi, headings)
+        k = min(k, len(self._coordinates))
+        indices = self.query(points, k=k, return_distance = False)
+        coordinates = self._coordinates[indices]
+        angleFromPoint = np.arctan2(coordinates[..., 1] - points[:, None, 1],
+                                    coordinates[..., 0] - points[:, None, 0])
+        headingFromPoint = math.pi/2 - headings[:, None] - angleFromPoint
+        forward = (-math.pi/2 <= headingFromPoint) & (headingFromPoint <= math.pi/2)
+        # the first forward candidate, or the closest node if there is none
+        first = np.where(forward.any(axis=1), np.argmax(forward, axis=1), 0)
+        return indices[np.arange(len(points)), first]
+
+
     def _projectTo2D(self, data):
         """
         Helper function to extract a list of coordinates from a list of TrackNodes.
 
         Parameter data: The TrackNode obejcts of the graph to create a KDTree for.
-        Precondition: data is a List of TrackNode objects.
+        Precondition: data is a List of TrackNode objects or a CompactTrackGraph.
         """
+        if hasattr(data, 'coordinates'):
+            return data.coordinates[:, :2]
         result = []
         for node in data:
             result.append([node.x,node.y])
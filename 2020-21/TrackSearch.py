@@ -0,0 +1,405 @@
+import copy
+import numpy as np
+from PriorityQueues import *
+
+inf = float("inf")
+
+def makeQueue(queue, capacity):
+    """
+    Returns an empty min priority queue of node ids of the requested kind.
+
+    Parameter queue: the queue backend, "heapq" for a LazyHeapQueue or "dary"
+    for an IndexedDaryHeap
+    Precondition: queue is "heapq" or "dary"
+
+    Parameter capacity: the number of node ids in the graph
+    Precondition: capacity is an int >= 0
+    """
+    if queue == "heapq":
+        return LazyHeapQueue(False)
+    if queue == "dary":
+        return IndexedDaryHeap(capacity)
+    raise ValueError("unknown queue backend " + repr(queue))
+
+
+def shortestPath(graph, start, end, queue = "heapq", heuristic = None):
+    """
+    Returns (path, energy, numSettled) for the minimum energy path from node
+    start to node end of a CompactTrackGraph, where path is the list of node
+    indices from start to end and numSettled is the number of nodes settled
+    by the search. Returns None if end cannot be reached.
+
+    Without a heuristic this is Dijkstra's algorithm. With one it is A*,
+    which orders the frontier by distance plus heuristic and settles fewer
+    nodes when the heuristic is tight.
+
+    Parameter graph: the graph to search
+    Precondition: graph is a CompactTrackGraph with non negative weights
+
+    Parameter start, end: the indices of the first and last node of the path
+    Precondition: start and end are ints in [0, len(graph))
+
+    Optional Parameter queue: the priority queue backend, see makeQueue
+    Precondition: queue is "heapq" or "dary"
+
+    Optional Parameter heuristic: lower bound of the energy from each node to
+    end, e.g. from energyLowerBound
+    Precondition: heuristic is None or a sequence of len(graph) floats that is
+    consistent, i.e. heuristic[u] <= weight(u, w) + heuristic[w] for every edge
+    """
+    numNodes = len(graph)
+    indptr = graph.indptr; indices = graph.indices; weights = graph.weights
+    dist = [inf]*numNodes
+    bckptr = [-1]*numNodes
+    settled = bytearray(numNodes)
+    F = makeQueue(queue, numNodes)
+    if heuristic is None:
+        heuristic = [0.0]*numNodes
+    elif hasattr(heuristic, 'tolist'):
+        heuristic = heuristic.tolist()
+    F.add(start, heuristic[start]); dist[start] = 0.0
+    numSettled = 0
+    # Invariant: as in optimumPath, with dist and bckptr holding d and bk of
+    # the settled and frontier nodes.
+    while len(F) != 0:
+        f = F.poll()
+        settled[f] = 1
+        numSettled += 1
+        if f == end:
+            path = []; node = end
+            while node != -1:
+                path.append(node)
+                node = bckptr[node]
+            path.reverse()
+            return path, dist[end], numSettled
+        fDist = dist[f]
+        lo = indptr[f]; hi = indptr[f+1]
+        for w, weight in zip(indices[lo:hi].tolist(), weights[lo:hi].tolist()):
+            if settled[w]:
+                continue
+            pathLength = fDist + weight
+            if pathLength < dist[w]:
+                if dist[w] == inf:
+                    F.add(w, pathLength + heuristic[w])
+                else:
+                    F.updatePriority(w, pathLength + heuristic[w])
+                dist[w] = pathLength
+                bckptr[w] = f
+    return None
+
+
+def stationSweep(graph, start, end):
+    """
+    Returns (path, energy) for the minimum energy path from node start to
+    node end of a CompactTrackGraph created by createCompactGraph, or None if
+    end cannot be reached.
+
+    Edges only go from station i to station i+1, so instead of a priority
+    queue the search sweeps the stations from start to end, relaxing all
+    numArrs x numArrs edges of a station with one NumPy min-plus step and
+    storing the best previous lane of every node in an integer back-pointer
+    array. Time: O(stations*numArrs**2), vectorized over the lanes.
+
+    Parameter graph: the graph to search
+    Precondition: graph is a CompactTrackGraph of createCompactGraph layout
+
+    Parameter start, end: the indices of the first and last node of the path
+    Precondition: start and end are ints in [0, len(graph))
+    """
+    numArrs = graph.numArrs; arrLen = graph.arrLen
+    if start == end:
+        return [start], 0.0
+    startStation, startLane = divmod(start, numArrs)
+    endStation, endLane = divmod(end, numArrs)
+    numSteps = (endStation - startStation) % arrLen
+    if numSteps == 0:
+        numSteps = arrLen # other lane of the same station, a full lap away
+    cost = np.full(numArrs, inf)
+    cost[startLane] = 0.0
+    cost, bckptr = _sweep(graph, startStation, cost, numSteps)
+    energy = float(cost[endLane])
+    if energy == inf:
+        return None
+    return _backtrack(graph, startStation, bckptr, endLane)[0], energy
+
+
+def _sweep(graph, startStation, cost, numSteps):
+    """
+    Helper function relaxing numSteps stations from startStation, where
+    cost[a] is the energy to reach lane a of startStation. Returns the cost
+    of each lane of the last station and the (numSteps, numArrs) array of the
+    previous lane of every node reached.
+    """
+    numArrs = graph.numArrs; arrLen = graph.arrLen
+    W = graph.weights.reshape(arrLen, numArrs, numArrs)
+    lanes = np.arange(numArrs)
+    bckptr = np.empty((numSteps, numArrs), dtype=np.intp)
+    # Invariant: cost[b] is the minimum energy from start to lane b of
+    # station startStation+step, and bckptr[0..step-1] hold the previous lane
+    # of each node on the corresponding minimum energy path.
+    for step in range(numSteps):
+        relaxed = cost[:, None] + W[(startStation + step) % arrLen]
+        bckptr[step] = np.argmin(relaxed, axis=0)
+        cost = relaxed[bckptr[step], lanes]
+    return cost, bckptr
+
+
+def _backtrack(graph, startStation, bckptr, endLane):
+    """
+    Helper function returning (path, startLane) of the path of a _sweep
+    from startStation ending at endLane of its last station.
+    """
+    numArrs = graph.numArrs; arrLen = graph.arrLen
+    numSteps = len(bckptr)
+    path = [((startStation + numSteps) % arrLen)*numArrs + endLane]; lane = endLane
+    for step in range(numSteps - 1, -1, -1):
+        lane = int(bckptr[step, lane])
+        path.append(((startStation + step) % arrLen)*numArrs + lane)
+    path.reverse()
+    return path, lane
+
+
+def lapMatrix(graph, station):
+    """
+    Returns the (numArrs, numArrs) array whose [a, b] entry is the minimum
+    energy of one lap from lane a of station back to lane b of station of a
+    CompactTrackGraph created by createCompactGraph.
+
+    Every lap of a race crosses the same edges, so a race of n laps costs
+    the min-plus product of n lap matrices. Time: O(stations*numArrs**3).
+    """
+    numArrs = graph.numArrs; arrLen = graph.arrLen
+    W = graph.weights.reshape(arrLen, numArrs, numArrs)
+    cost = np.full((numArrs, numArrs), inf)
+    np.fill_diagonal(cost, 0.0)
+    for step in range(arrLen):
+        cost = minPlusProduct(cost, W[(station + step) % arrLen])
+    return cost
+
+
+def minPlusProduct(A, B):
+    """
+    Returns the product of the matrices A and B in the min-plus semiring,
+    whose [a, b] entry is min over m of A[a, m] + B[m, b].
+    """
+    return np.min(A[:, :, None] + B[None, :, :], axis=1)
+
+
+def minPlusPower(matrix, n):
+    """
+    Returns the n-th power of a square matrix in the min-plus semiring by
+    repeated squaring, e.g. the energy between the lanes of a station n laps
+    apart from its lapMatrix. Time: O(numArrs**3 log n).
+
+    Precondition: matrix is a square float array and n is an int >= 0
+    """
+    return _minPlusPowers(matrix, n)[n]
+
+
+def _minPlusPowers(matrix, n):
+    """
+    Helper function returning the dictionary of the min-plus powers of
+    matrix computed while raising it to the n-th power by repeated squaring:
+    the 2**k-th powers up to n and the (n mod 2**k)-th powers, including
+    the 0-th and the n-th. Every one of them but the 2**k-th splits into a
+    2**k-th and an (n mod 2**k)-th power of the dictionary, see
+    MultiLapPath.
+    """
+    identity = np.full(matrix.shape, inf)
+    np.fill_diagonal(identity, 0.0)
+    powers = {0: identity, 1: matrix}
+    result = identity; power = 1; remainder = 0
+    # Invariant: matrix is the power-th power and result the remainder-th
+    # power, where remainder = n mod power.
+    while power <= n:
+        if n & power:
+            result = minPlusProduct(matrix, result)
+            remainder += power
+            powers[remainder] = result
+        matrix = minPlusProduct(matrix, matrix)
+        power *= 2
+        powers[power] = matrix
+    return powers
+
+
+class MultiLapPath:
+    """
+    Read-only sequence of the node indices of a race found by multiLapSweep,
+    generated lap by lap instead of stored.
+
+    The race is numLaps-1 full laps from the start station back to it and a
+    last sweep to the end node. Only the lane at the start and end of the
+    full laps and the min-plus powers of the lap matrix used to combine them
+    are kept. The lane at any lap boundary is found by splitting the laps in
+    two halves whose powers are known, and picking the middle lane that
+    gives the minimum energy. The path of each lap is found by a sweep
+    between its lanes and cached per pair of lanes.
+    Memory: O(stations*numArrs + numArrs**2 log numLaps + cached laps), time
+    per item O(numArrs log numLaps).
+    """
+    # _graph = the CompactTrackGraph searched
+    # _startStation = the station of the start node
+    # _numFull = the number of full laps
+    # _powers = the _minPlusPowers of the lap matrix for _numFull
+    # _startLane, _endLane = the lanes at the start and end of the full laps
+    # _lastLap = the node indices of the last sweep, from the start station
+    # _laps = dictionary of the node indices of the lap between a pair of lanes
+    # _function = the function applied to each node index
+
+    def __init__(self, graph, startStation, numFull, powers, startLane, endLane, lastLap):
+        """
+        Initializes the path of a race; see multiLapSweep.
+        """
+        self._graph = graph
+        self._startStation = startStation
+        self._numFull = numFull
+        self._powers = powers
+        self._startLane = startLane
+        self._endLane = endLane
+        self._lastLap = lastLap
+        self._laps = {}
+        self._function = None
+
+    def __len__(self):
+        """
+        Overrides python function "len(MultiLapPath)"
+        """
+        return self._numFull*self._graph.arrLen + len(self._lastLap)
+
+    def __getitem__(self, index):
+        """
+        Returns the node index at position index of the path.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("path index out of range")
+        lap, position = divmod(index, self._graph.arrLen)
+        if lap < self._numFull:
+            node = self._lap(self._boundaryLane(lap), self._boundaryLane(lap + 1))[position]
+        else:
+            node = self._lastLap[index - self._numFull*self._graph.arrLen]
+        return node if self._function is None else self._function(node)
+
+    def __iter__(self):
+        """
+        Yields the node indices of the path in order.
+        """
+        lanes = self._boundaryLanes(self._startLane, self._endLane, 0, self._numFull)
+        previous = self._startLane
+        for lane in lanes:
+            for node in self._lap(previous, lane)[:-1]:
+                yield node if self._function is None else self._function(node)
+            previous = lane
+        for node in self._lastLap:
+            yield node if self._function is None else self._function(node)
+
+    def map(self, function):
+        """
+        Returns a view of this path whose items are function(node index),
+        e.g. graph.__getitem__ for the TrackNode views of the nodes.
+        """
+        view = copy.copy(self)
+        view._function = function
+        return view
+
+    def _split(self, lo, hi):
+        """
+        Helper function returning the boundary between the laps lo and hi
+        whose powers are in _powers: the first half is the largest power of
+        two laps below hi-lo, so the second is a power of two or a remainder
+        """
+        half = 1 << ((hi - lo - 1).bit_length() - 1)
+        return lo + half
+
+    def _middleLane(self, a, b, lo, middle, hi):
+        """
+        Helper function returning the lane at lap middle on a minimum energy
+        path from lane a at lap lo to lane b at lap hi
+        """
+        powers = self._powers
+        return int(np.argmin(powers[middle - lo][a] + powers[hi - middle][:, b]))
+
+    def _boundaryLane(self, lap):
+        """
+        Helper function returning the lane at the start of lap, for lap in
+        [0, numFull]
+        """
+        a = self._startLane; b = self._endLane; lo = 0; hi = self._numFull
+        while True:
+            if lap == lo:
+                return a
+            if lap == hi:
+                return b
+            middle = self._split(lo, hi)
+            lane = self._middleLane(a, b, lo, middle, hi)
+            if lap < middle:
+                b, hi = lane, middle
+            else:
+                a, lo = lane, middle
+
+    def _boundaryLanes(self, a, b, lo, hi):
+        """
+        Helper function yielding the lanes at the start of the laps lo+1 to
+        hi of a minimum energy path from lane a at lap lo to lane b at lap hi
+        """
+        if hi - lo == 1:
+            yield b
+        elif hi > lo:
+            middle = self._split(lo, hi)
+            lane = self._middleLane(a, b, lo, middle, hi)
+            yield from self._boundaryLanes(a, lane, lo, middle)
+            yield from self._boundaryLanes(lane, b, middle, hi)
+
+    def _lap(self, a, b):
+        """
+        Helper function returning the node indices of the minimum energy lap
+        from lane a to lane b of the start station
+        """
+        if (a, b) not in self._laps:
+            cost = np.full(self._graph.numArrs, inf)
+            cost[a] = 0.0
+            bckptr = _sweep(self._graph, self._startStation, cost, self._graph.arrLen)[1]
+            self._laps[(a, b)] = _backtrack(self._graph, self._startStation, bckptr, b)[0]
+        return self._laps[(a, b)]
+
+
+def multiLapSweep(graph, start, end, numLaps):
+    """
+    Returns (path, energy) for the minimum energy path of a race of numLaps
+    laps from node start to node end of a CompactTrackGraph created by
+    createCompactGraph, or None if end cannot be reached. The race does
+    numLaps-1 full laps back to the station of start and then goes on to end;
+    if end is on the station of start the last lap is a full lap too. path
+    is a MultiLapPath of the node indices.
+
+    The track is stored once. The energy of the full laps between each pair
+    of lanes is the min-plus power of the lapMatrix of the start station,
+    found by repeated squaring, and the last lap is swept from it. Memory
+    does not depend on numLaps but for the O(numArrs**2 log numLaps) powers.
+    Time: O(stations*numArrs**3 + numArrs**3 log numLaps).
+
+    Parameter numLaps: the number of laps of the race
+    Precondition: numLaps is an int > 0
+    """
+    assert numLaps > 0
+    numArrs = graph.numArrs; arrLen = graph.arrLen
+    startStation, startLane = divmod(start, numArrs)
+    endStation, endLane = divmod(end, numArrs)
+    numFull = numLaps - 1
+    powers = None
+    cost = np.full(numArrs, inf)
+    cost[startLane] = 0.0
+    if numFull > 0:
+        powers = _minPlusPowers(lapMatrix(graph, startStation), numFull)
+        cost = powers[numFull][startLane].copy()
+    numSteps = (endStation - startStation) % arrLen
+    if numSteps == 0:
+        numSteps = arrLen
+    cost, bckptr = _sweep(graph, startStation, cost, numSteps)
+    energy = float(cost[endLane])
+    if energy == inf:
+        return None
+    lastLap, lane = _backtrack(graph, startStation, bckptr, endLane)
+    path = MultiLapPath(graph, startStation, numFull, powers, startLane, lane, lastLap)
+    return path, energy